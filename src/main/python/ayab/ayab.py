@@ -24,16 +24,17 @@ import sys
 import os
 import logging
 
-from PyQt5 import QtWidgets, QtGui, QtCore
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import QMainWindow
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, pyqtSlot
 
-from PIL import Image
 from fysom import FysomError
 
 from ayab.ayab_gui import Ui_MainWindow
-from ayab.plugins.ayab_plugin import AyabPluginControl
+from ayab.plugins.ayab_plugin.ayab_control import AyabPluginControl
 from ayab.plugins.ayab_plugin.firmware_flash import FirmwareFlash
+from ayab.pattern_view import PatternScene, MACHINE_WIDTH
+from ayab import image_loading, image_transforms
 from ayab.ayab_about import Ui_AboutForm
 
 # Temporal serial imports.
@@ -89,6 +90,8 @@ class GuiMain(QMainWindow):
         self.image_file_route = None        
 
         self.pil_image = None
+        # horizontal and vertical repeats of pil_image, kept virtual
+        self.image_repeat = (1, 1)
         self.start_needle = 80
         self.stop_needle = 119
         self.imageAlignment = "center"
@@ -97,6 +100,17 @@ class GuiMain(QMainWindow):
 
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        # the scene is kept, refresh_scene only draws a new image into it
+        self.pattern_scene = PatternScene(self)
+        self.ui.image_pattern_view.setScene(self.pattern_scene)
+        # image transforms run on a worker thread, showing a busy bar
+        self.image_worker = ImageWorker(self)
+        self.image_worker_progress = QtWidgets.QProgressBar()
+        self.image_worker_progress.setRange(0, 0)
+        self.image_worker_progress.setMaximumWidth(150)
+        self.image_worker_progress.hide()
+        self.statusBar().addPermanentWidget(self.image_worker_progress)
+        self.image_worker.busy.connect(self.image_worker_progress.setVisible)
         self.enabled_plugin = AyabPluginControl()
         self.enabled_plugin.setup_ui(self)
         self.showMaximized()
@@ -110,7 +124,7 @@ class GuiMain(QMainWindow):
         '''Updates the Progress Bar.'''
         #Store to local variable
         self.var_progress = row
-        self.refresh_scene()
+        self.pattern_scene.setProgress(row)
 
         # Update label
         if total != 0:
@@ -154,12 +168,12 @@ class GuiMain(QMainWindow):
         '''Updates the position of the start/stop needle visualisation'''
         self.start_needle = start_needle
         self.stop_needle = stop_needle
-        self.refresh_scene()
+        self.pattern_scene.setNeedles(start_needle, stop_needle)
 
     def slotUpdateAlignment(self, alignment):
         '''Updates the alignment of the image between start/stop needle'''
         self.imageAlignment = alignment
-        self.refresh_scene()
+        self.pattern_scene.setAlignment(alignment)
 
     def slotUpdateWidgetKnitcontrolEnabled(self, enabled):
         self.ui.widget_knitcontrol.setEnabled(enabled)        
@@ -174,11 +188,12 @@ class GuiMain(QMainWindow):
             zoom = event.angleDelta().y() / 120
 
             self.zoomlevel = self.zoomlevel + zoom
-            if self.zoomlevel <= 1:
-                self.zoomlevel = 1
+            # below 1, every step halves the size, down to 1/16
+            if self.zoomlevel <= -3:
+                self.zoomlevel = -3
             elif self.zoomlevel >= 5:
                 self.zoomlevel = 5
-            self.refresh_scene()
+            self.apply_zoom()
 
     def start_knitting_process(self):
         # Disable everything which should not be touched
@@ -189,6 +204,8 @@ class GuiMain(QMainWindow):
         self.ui.widget_optionsdock.setEnabled(False)
         self.ui.knit_button.setEnabled(False)
         self.ui.cancel_button.setEnabled(True)
+        # a transform finishing now would change the image being knitted
+        self.image_worker.cancel()
 
         self.gt = GenericThread(self.enabled_plugin.knit, parent_window=self)
         self.gt.start()
@@ -237,12 +254,46 @@ class GuiMain(QMainWindow):
         self.ui.actionVertical_Flip.triggered.connect(self.flip_image)
 
     def load_image_from_string(self, image_str):
-        '''Loads an image into self.ui.image_pattern_view using a temporary QGraphicsScene'''
+        '''Loads an image into self.ui.image_pattern_view on a worker thread
 
-        # TODO Check for maximum width before loading the image
-        self.pil_image = Image.open(image_str)
+        The header is read first, rejecting images wider than the machine,
+        and large JPEG images are shown as a preview until they are loaded.
+        '''
+        def run(cancellation):
+            try:
+                return image_loading.open_image(image_str, MACHINE_WIDTH,
+                                                cancellation)
+            except image_loading.ImageLoadError as e:
+                return e
+        # a transform would cancel loading
+        self.ui.menuImage_Actions.setEnabled(False)
+        self.image_worker.submit(
+            run, lambda result: self.__image_opened(image_str, result))
 
-        self.pil_image = self.pil_image.convert("RGBA")
+    def __image_opened(self, image_str, result):
+        if result is None or isinstance(result, Exception):
+            self.__image_failed(result or "Could not open " + image_str)
+            return
+        size, preview = result
+        if preview is not None:
+            self.set_dimensions_on_gui(*size)
+            self.pattern_scene.setImage(preview, size=size)
+            self.apply_zoom()
+
+        def run(cancellation):
+            try:
+                return image_loading.load_image(image_str, cancellation)
+            except image_loading.ImageLoadError as e:
+                return e
+        self.image_worker.submit(
+            run, lambda result: self.__image_loaded(image_str, result))
+
+    def __image_loaded(self, image_str, result):
+        if result is None or isinstance(result, Exception):
+            self.__image_failed(result or "Could not load " + image_str)
+            return
+        self.pil_image = result
+        self.image_repeat = (1, 1)
 
         self.refresh_scene()
         self.statusBar().showMessage(image_str)
@@ -250,88 +301,41 @@ class GuiMain(QMainWindow):
         self.ui.widget_optionsdock.setEnabled(True)
         self.ui.menuImage_Actions.setEnabled(True)
         # Tell loaded plugin elements about changed parameters
-        width, height = self.pil_image.size
+        width, height = self.image_size()
         self.enabled_plugin.slotSetImageDimensions(width,
                                                    height)
 
-    def refresh_scene(self):
-        '''Updates the current scene '''
+    def __image_failed(self, message):
+        '''Shows the image loaded before again.'''
+        if self.pil_image is not None:
+            self.refresh_scene()
+            self.ui.menuImage_Actions.setEnabled(True)
+        else:
+            self.pattern_scene.setImage(None)
+        self.display_blocking_pop_up(str(message), "warning")
+
+    def image_size(self):
+        '''Returns the size of the image including its repeats.'''
         width, height = self.pil_image.size
+        return width * self.image_repeat[0], height * self.image_repeat[1]
 
-        data = self.pil_image.convert("RGBA").tobytes("raw", "RGBA")
-        qim = QtGui.QImage(data,
-                           self.pil_image.size[0],
-                           self.pil_image.size[1],
-                           QtGui.QImage.Format_ARGB32)
-        pixmap = QtGui.QPixmap.fromImage(qim)
-
-        self.set_dimensions_on_gui(pixmap.width(), pixmap.height())
-
-        qscene = QtWidgets.QGraphicsScene()
-
-        # TODO move to generic configuration
-        machine_width = 200
-        bar_height = 5.0
-
-        # add pattern and move accordingly to alignment
-        pattern = qscene.addPixmap(pixmap)
-        if self.imageAlignment == 'left':
-            pattern.setPos(
-                (self.start_needle - 100),
-                0)
-        elif self.imageAlignment == 'center':
-            pattern.setPos(
-                -(pixmap.width()/2.0)+((self.start_needle+self.stop_needle)/2) - 100,
-                0)
-        elif self.imageAlignment == 'right':
-            pattern.setPos(
-                (self.stop_needle - 100 - pixmap.width()),
-                0)
-        else:
-            logging.warning("invalid alignment")
-
-        # Draw "machine"
-        rect_orange = QtWidgets.QGraphicsRectItem(
-            -(machine_width/2.0),
-            -bar_height,
-            (machine_width/2.0),
-            bar_height)
-        rect_orange.setBrush(QtGui.QBrush(QtGui.QColor("orange")))
-        rect_green = QtWidgets.QGraphicsRectItem(
-            0.0,
-            -bar_height,
-            (machine_width/2.0),
-            bar_height)
-        rect_green.setBrush(QtGui.QBrush(QtGui.QColor("green")))
-
-        qscene.addItem(rect_orange)
-        qscene.addItem(rect_green)
-
-        # Draw limiting lines (start/stop needle)
-        limit_bar_width = 0.5
-
-        qscene.addItem(
-            QtWidgets.QGraphicsRectItem(self.start_needle - 101,
-                                        -bar_height,
-                                        limit_bar_width,
-                                        pixmap.height() + 2*bar_height))
-        qscene.addItem(
-            QtWidgets.QGraphicsRectItem(self.stop_needle - 100,
-                                        -bar_height,
-                                        limit_bar_width,
-                                        pixmap.height() + 2*bar_height))
-
-        # Draw knitting progress
-        qscene.addItem(
-            QtWidgets.QGraphicsRectItem(-(machine_width/2.0),
-                                        pixmap.height() - self.var_progress,
-                                        machine_width,
-                                        limit_bar_width))
+    def refresh_scene(self):
+        '''Draws the current image into the scene'''
+        width, height = self.image_size()
+        self.set_dimensions_on_gui(width, height)
+
+        self.pattern_scene.setImage(self.pil_image, self.image_repeat)
+        self.apply_zoom()
 
+    def apply_zoom(self):
+        '''Scales the pattern view to the zoom level'''
         qv = self.ui.image_pattern_view
+        if self.zoomlevel >= 1:
+            scale = self.zoomlevel
+        else:
+            scale = 2.0 ** (self.zoomlevel - 1)
         qv.resetTransform()
-        qv.scale(self.zoomlevel, self.zoomlevel)
-        qv.setScene(qscene)
+        qv.scale(scale, scale)
 
     def set_dimensions_on_gui(self, width, height):
         text = "{} - {}".format(width, height)
@@ -427,85 +431,37 @@ class GuiMain(QMainWindow):
     def apply_image_transform(self, transform_type, *args):
         '''Executes an image transform specified by key and args.
 
-        Calls a function from transform_dict, forwarding args and the image,
-        and replaces the QtImage on scene.
+        The transform (see image_transforms) runs on a worker thread,
+        cancelling a transform still running. Its result replaces the
+        QtImage on scene.
         '''
-        transform_dict = {
-            'invert': self.__invert_image,
-            'repeat': self.__repeat_image,
-            'mirror': self.__mirror_image,
-            'flip': self.__flip_image,
-            'rotate': self.__rotate_image,
-        }
-        transform = transform_dict.get(transform_type)
         image = self.pil_image
         if not image:
             return
-        # Executes the transform function
-        try:
-            image = transform(image, args)
-        except:
-            logging.error("Error on executing transform")
+        repeat = self.image_repeat
+
+        def run(cancellation):
+            return image_transforms.transform(transform_type, image, repeat,
+                                              args, cancellation)
+        self.image_worker.submit(run, self.__image_transformed)
 
+    def __image_transformed(self, result):
+        if result is None:
+            logging.error("Error on executing transform")
+            return
         # Update the view
-        self.pil_image = image
+        self.pil_image, self.image_repeat = result
 
         # Disable Knit Controls
         self.ui.widget_knitcontrol.setEnabled(False)
 
         # Update maximum values
-        width, height = self.pil_image.size
+        width, height = self.image_size()
         self.enabled_plugin.slotSetImageDimensions(width,
                                                    height)
         # Draw canvas
         self.refresh_scene()
 
-    def __rotate_image(self, image, args):
-        if not args:
-            logging.debug("image not altered on __rotate_image.")
-            return image
-        logging.debug("rotating image")
-        rotated_image = image.rotate(args[0], expand=1)
-        return rotated_image
-
-    def __invert_image(self, image, args):
-        import PIL.ImageOps
-
-        if image.mode == 'RGBA':
-            r, g, b, a = image.split()
-            rgb_image = Image.merge('RGB', (r, g, b))
-            inverted_image = PIL.ImageOps.invert(rgb_image)
-        else:
-            inverted_image = PIL.ImageOps.invert(image)
-
-        return inverted_image
-
-    def __mirror_image(self, image, args):
-        import PIL.ImageOps
-        mirrored_image = PIL.ImageOps.mirror(image)
-        return mirrored_image
-
-    def __flip_image(self, image, args):
-        import PIL.ImageOps
-        flipped_image = PIL.ImageOps.flip(image)
-        return flipped_image
-
-    def __repeat_image(self, image, args):
-        """
-        Repeat image.
-        Repeat pHorizontal times horizontally, pVertical times vertically
-        Sturla Lange 2017-12-30
-        """
-        old_h = image.size[1]
-        old_w = image.size[0]
-        new_h = old_h*args[0] # pVertical
-        new_w = old_w*args[1] # pHorizontal
-        new_im = Image.new('RGB', (new_w,new_h))
-        for h in range(0,new_h,old_h):
-          for w in range(0,new_w,old_w):
-            new_im.paste(image, (w,h))
-        return new_im
-
     def getSerialPorts(self):
         """
         Returns a list of all USB Serial Ports
@@ -522,6 +478,75 @@ class GuiMain(QMainWindow):
         #    playsound(self.app_context.get_resource("assets/finish.wav"))
 
 
+class ImageWorker(QtCore.QObject):
+    '''Runs image work on the global thread pool, one task at a time.
+
+    Submitting a task cancels the one still running. Callbacks are called on
+    the GUI thread with the result, or None if the task failed, and only
+    for the task submitted last.
+    '''
+
+    busy = pyqtSignal(bool)
+    __finished = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super(ImageWorker, self).__init__(parent)
+        self.__task = 0
+        self.__cancellation = None
+        self.__callback = None
+        # queued, so callbacks run on the thread of the worker object
+        self.__finished.connect(self.__on_finished, Qt.QueuedConnection)
+
+    def submit(self, function, callback):
+        '''Runs function(cancellation) and then callback(result).'''
+        self.cancel()
+        self.__task += 1
+        self.__cancellation = image_transforms.Cancellation()
+        self.__callback = callback
+        QtCore.QThreadPool.globalInstance().start(
+            _ImageTask(self.__task, function, self.__cancellation,
+                       self.__finished))
+        self.busy.emit(True)
+
+    def cancel(self):
+        '''Cancels the running task, its callback is not called.'''
+        if self.__cancellation is not None:
+            self.__cancellation.cancel()
+            self.__cancellation = None
+            self.__callback = None
+            self.busy.emit(False)
+
+    def __on_finished(self, task, result):
+        if task != self.__task or self.__callback is None:
+            # cancelled, or replaced by a newer task
+            return
+        callback = self.__callback
+        self.__cancellation = None
+        self.__callback = None
+        self.busy.emit(False)
+        callback(result)
+
+
+class _ImageTask(QtCore.QRunnable):
+
+    def __init__(self, task, function, cancellation, finished):
+        super(_ImageTask, self).__init__()
+        self.__task = task
+        self.__function = function
+        self.__cancellation = cancellation
+        self.__finished = finished
+
+    def run(self):
+        try:
+            result = self.__function(self.__cancellation)
+        except image_transforms.TransformCancelled:
+            return
+        except Exception:
+            logging.exception("image task failed")
+            result = None
+        self.__finished.emit(self.__task, result)
+
+
 class GenericThread(QThread):
     '''A generic thread wrapper for functions on threads.'''
 
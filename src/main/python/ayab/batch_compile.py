@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Compiles a directory of images to knitting jobs.
+
+Every image is compiled like the GUI does when configuring, and written as
+a job file (see ayab_job) next to it or into an output directory. Images are
+compiled in parallel by a pool of processes.
+
+Usage:
+  ayab-compile [options] DIRECTORY
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+import os
+import sys
+import time
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff")
+
+DEFAULT_OPTIONS = {"num_colors": 2,
+                   "knitting_mode": 0,
+                   "inf_repeat": 0,
+                   "start_needle": 80,
+                   "stop_needle": 119,
+                   "alignment": "center",
+                   "start_line": 0}
+
+
+def compileFile(imagePath, jobPath, options):
+  """Compiles one image to a job file.
+
+  Returns:
+    tuple: (imagePath, number of lines, seconds, error message or None)
+  """
+  # imported here, the pool processes load them on their own
+  from PIL import Image
+  from ayab.core.ayab_image import compileImage
+  from ayab.core.ayab_job import writeJob
+
+  start = time.time()
+  try:
+    # the GUI loads every image as RGBA
+    pil_image = Image.open(imagePath).convert("RGBA")
+    image = compileImage(pil_image, options)
+    image.setStartLine(options.get("start_line", 0))
+    writeJob(jobPath, image)
+    numLines = len(image.schedule())
+  except Exception as e:
+    return imagePath, 0, time.time() - start, str(e)
+  return imagePath, numLines, time.time() - start, None
+
+
+def findImages(directory):
+  return sorted(os.path.join(directory, name)
+                for name in os.listdir(directory)
+                if name.lower().endswith(IMAGE_SUFFIXES))
+
+
+def jobPathFor(imagePath, outputDirectory=None):
+  from ayab.core.ayab_job import JOB_FILE_SUFFIX
+  name = os.path.splitext(os.path.basename(imagePath))[0] + JOB_FILE_SUFFIX
+  return os.path.join(outputDirectory or os.path.dirname(imagePath), name)
+
+
+def compileDirectory(directory, options, outputDirectory=None, processes=None,
+                     out=sys.stdout):
+  """Compiles all images of a directory, printing the time for each one.
+
+  Returns:
+    int: the number of images which could not be compiled.
+  """
+  images = findImages(directory)
+  if outputDirectory and not os.path.isdir(outputDirectory):
+    os.makedirs(outputDirectory)
+
+  start = time.time()
+  failed = 0
+  totalLines = 0
+  with ProcessPoolExecutor(max_workers=processes) as pool:
+    results = pool.map(compileFile, images,
+                       [jobPathFor(path, outputDirectory) for path in images],
+                       [options] * len(images))
+    for imagePath, numLines, seconds, error in results:
+      name = os.path.basename(imagePath)
+      if error is None:
+        totalLines += numLines
+        out.write("{0}: {1} lines in {2:.3f} s\n".format(name, numLines,
+                                                          seconds))
+      else:
+        failed += 1
+        out.write("{0}: failed after {1:.3f} s: {2}\n".format(name, seconds,
+                                                               error))
+
+  elapsed = max(time.time() - start, 1e-9)
+  out.write("compiled {0} of {1} images in {2:.3f} s "
+            "({3:.1f} images/s, {4:.0f} lines/s)\n"
+            .format(len(images) - failed, len(images), elapsed,
+                    (len(images) - failed) / elapsed, totalLines / elapsed))
+  return failed
+
+
+def addOptionArguments(parser):
+  """Adds the arguments setting the knitting configuration."""
+  parser.add_argument("-c", "--config",
+                      help="JSON file with the configuration, using the "
+                           "keys of the GUI configuration")
+  parser.add_argument("--num-colors", type=int)
+  parser.add_argument("--knitting-mode", type=int)
+  parser.add_argument("--start-needle", type=int)
+  parser.add_argument("--stop-needle", type=int)
+  parser.add_argument("--alignment")
+  parser.add_argument("--start-line", type=int)
+  parser.add_argument("--inf-repeat", type=int, choices=(0, 1))
+
+
+def optionsFromArguments(args):
+  """Returns the configuration of the defaults, config file and arguments."""
+  options = dict(DEFAULT_OPTIONS)
+  if args.config:
+    with open(args.config) as f:
+      options.update(json.load(f))
+  for option in DEFAULT_OPTIONS:
+    value = getattr(args, option)
+    if value is not None:
+      options[option] = value
+  return options
+
+
+def parseArguments(argv):
+  parser = argparse.ArgumentParser(
+    prog="ayab-compile",
+    description="Compiles all images of a directory to knitting jobs.")
+  parser.add_argument("directory", help="directory holding the images")
+  parser.add_argument("-o", "--output",
+                      help="directory for the job files, "
+                           "default is the image directory")
+  parser.add_argument("-j", "--jobs", type=int, default=None,
+                      help="number of processes, default is one per CPU")
+  addOptionArguments(parser)
+  args = parser.parse_args(argv)
+  if not os.path.isdir(args.directory):
+    parser.error("{0} is not a directory".format(args.directory))
+  return args
+
+
+def main(argv=None):
+  logging.basicConfig(level=logging.WARNING)
+  args = parseArguments(sys.argv[1:] if argv is None else argv)
+
+  options = optionsFromArguments(args)
+  return 1 if compileDirectory(args.directory, options, args.output,
+                               args.jobs) else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Knitting without a user interface.
+
+The image pipeline (ayab_image, ayab_pattern, ayab_planner), compiled
+patterns and jobs (ayab_cache, ayab_job), line scheduling and the protocol
+with the controller (ayab_scheduler, ayab_session, ayab_communication and
+its asyncio variant ayab_async, ayab_messages) and the reporting of the
+knitting progress (ayab_progress).
+
+Nothing in this package imports PyQt5. The package imports none of its
+modules, and the modules load heavy dependencies like numpy, Pillow and
+pyserial only where they are needed, so tools load just what they use.
+"""
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Handles the serial communication protocol in an asyncio event loop.
+
+AsyncAyabCommunication sends the same messages as AyabCommunication from
+coroutines, and the received messages are read with ``async for``. One
+event loop can talk to several controllers this way, without a thread per
+port.
+
+Ports with a file descriptor are read when the event loop reports them
+readable. Ports without one, like pyserial's loop:// or ports on Windows,
+are polled every POLL_INTERVAL seconds.
+"""
+
+import asyncio
+import io
+import logging
+
+import sliplib
+
+from .ayab_communication import CommunicationException, reqStartFrame, \
+  reqInfoFrame, reqTestFrame, cnfLineFrame
+
+# seconds between reads of ports without a file descriptor
+POLL_INTERVAL = 0.005
+
+# queued when reading stops
+_CLOSED = object()
+
+
+class AsyncAyabCommunication(object):
+  """Class handling the serial communication protocol with coroutines.
+
+  Messages are read once the first message is awaited, from the event loop
+  running then. The port is switched to reads which do not block::
+
+    com = AsyncAyabCommunication()
+    com.open_serial(portname)
+    await com.req_info()
+    async for msg in com:
+      ...
+
+  Args:
+    serial: An opened serial-like object, optional.
+  """
+
+  def __init__(self, serial=None):
+    self.__logger = logging.getLogger(type(self).__name__)
+    self.__ser = serial
+    self.__messages = None
+    self.__driver = None
+    self.__reading = False
+    self.__loop = None
+    self.__fileno = None
+    self.__pollTask = None
+
+  def open_serial(self, portname):
+    """Opens serial port communication with a portName."""
+    if self.__ser is None:
+      # pyserial is only loaded once a port is opened
+      import serial
+      try:
+        self.__ser = serial.Serial(portname, 115200, timeout=0)
+      except (IOError, ValueError):
+        self.__logger.error("could not open serial port " + portname)
+        raise CommunicationException()
+      self.__messages = None
+    return True
+
+  def close_serial(self):
+    """Stops reading and closes the serial port."""
+    self.__stopReading()
+    if self.__ser is not None and self.__ser.isOpen():
+      self.__ser.close()
+    self.__ser = None
+
+  async def req_start(self, startNeedle, stopNeedle, continuousReporting):
+    """Sends a start message to the controller."""
+    self.__write(reqStartFrame(startNeedle, stopNeedle, continuousReporting))
+
+  async def req_info(self):
+    """Sends a request for information to controller."""
+    self.__write(reqInfoFrame())
+
+  async def req_test(self):
+    self.__write(reqTestFrame())
+
+  async def cnf_line(self, lineNumber, lineData, flags, crc8=None):
+    """Sends a line of data, see AyabCommunication.cnf_line()."""
+    self.__write(cnfLineFrame(lineNumber, lineData, flags, crc8))
+
+  async def cnf_line_frame(self, lineNumber, lineFrame):
+    """Sends a line encoded in advance as LineFrame."""
+    self.__write(lineFrame.frame(lineNumber))
+
+  async def receive(self):
+    """Waits for the next message from the controller.
+
+    Returns:
+      bytes: The decoded message.
+
+    Raises:
+      CommunicationException: If the serial port was closed or failed.
+    """
+    if self.__messages is None:
+      if self.__ser is None:
+        raise CommunicationException("serial port not open")
+      self.__startReading()
+    msg = await self.__messages.get()
+    if msg is _CLOSED:
+      # later calls fail as well
+      self.__messages.put_nowait(_CLOSED)
+      raise CommunicationException("serial port closed")
+    return msg
+
+  def __aiter__(self):
+    return self
+
+  async def __anext__(self):
+    """Returns the next message, ending once the port is closed."""
+    try:
+      return await self.receive()
+    except CommunicationException:
+      raise StopAsyncIteration
+
+  def __write(self, frame):
+    if self.__ser is None:
+      raise CommunicationException("serial port not open")
+    # a frame fits into the output buffer of the port, writing returns
+    # without waiting for the controller
+    self.__ser.write(frame)
+
+  def __startReading(self):
+    self.__messages = asyncio.Queue()
+    self.__driver = sliplib.Driver()
+    self.__reading = True
+    self.__loop = asyncio.get_event_loop()
+    # reads return the bytes waiting, without blocking the loop
+    self.__ser.timeout = 0
+    try:
+      self.__fileno = self.__ser.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+      self.__pollTask = self.__loop.create_task(self.__poll())
+    else:
+      self.__loop.add_reader(self.__fileno, self.__read)
+
+  def __stopReading(self):
+    if not self.__reading:
+      return
+    self.__reading = False
+    if self.__fileno is not None:
+      self.__loop.remove_reader(self.__fileno)
+      self.__fileno = None
+    if self.__pollTask is not None:
+      self.__pollTask.cancel()
+      self.__pollTask = None
+    self.__messages.put_nowait(_CLOSED)
+
+  def __read(self):
+    """Queues the messages in the bytes waiting.
+
+    Returns:
+      bool: True if bytes were read.
+    """
+    try:
+      data = self.__ser.read(max(1, self.__ser.in_waiting))
+    except (IOError, ValueError) as e:
+      self.__logger.error("reading from serial port failed: " + str(e))
+      self.__stopReading()
+      return False
+    if data:
+      for message in self.__driver.receive(data):
+        self.__messages.put_nowait(message)
+    return bool(data)
+
+  async def __poll(self):
+    while self.__reading:
+      if not self.__read():
+        await asyncio.sleep(POLL_INTERVAL)
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Caches compiled patterns.
+
+A compiled pattern is an ayabImage with the needles and alignment applied.
+Patterns are looked up by a hash of the image content together with the
+options that change the generated lines, so configuring an unchanged job
+again reuses the pattern instead of converting the image once more.
+
+PatternCache keeps patterns in memory, DiskPatternCache keeps them in files
+which are memory-mapped when they are used again, also in later sessions.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+# options changing the output of ayabImage
+PATTERN_OPTIONS = ("num_colors", "knitting_mode", "start_needle",
+                   "stop_needle", "alignment", "inf_repeat", "repeat")
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ayab",
+                                 "patterns")
+DEFAULT_DISK_CACHE_BYTES = 512 * 1024 * 1024
+DEFAULT_DISK_CACHE_AGE = 30 * 24 * 60 * 60  # seconds
+
+PATTERN_FILE_MAGIC = b"AYABPAT\x01"
+PATTERN_FILE_SUFFIX = ".ayabpat"
+_HEADER_LENGTH = struct.Struct("<I")
+_ARRAY_ALIGNMENT = 16
+
+
+def imageHash(pil_image):
+  """Returns a hex digest of the mode, size and pixels of a PIL image."""
+  digest = hashlib.sha1()
+  digest.update(pil_image.mode.encode("ascii"))
+  digest.update(("%dx%d" % pil_image.size).encode("ascii"))
+  digest.update(pil_image.tobytes())
+  return digest.hexdigest()
+
+
+def patternKey(imgHash, options):
+  """Returns the cache key of an image hash and a configuration dict."""
+  return (imgHash,) + tuple(options.get(option) for option in PATTERN_OPTIONS)
+
+
+class PatternCache(object):
+  """Least recently used cache of compiled patterns.
+
+  The cache holds at most maxBytes of pattern data, as reported by the
+  nbytes() method of the cached objects when they are stored. A pattern
+  larger than the whole cache is not stored.
+  """
+
+  def __init__(self, maxBytes=DEFAULT_CACHE_BYTES):
+    self.__logger = logging.getLogger(type(self).__name__)
+    self.__maxBytes = maxBytes
+    self.__entries = OrderedDict()
+    self.__size = 0
+    self.__lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.__entries)
+
+  def __contains__(self, key):
+    return key in self.__entries
+
+  def maxBytes(self):
+    return self.__maxBytes
+
+  def size(self):
+    """Returns the amount of bytes currently held by the cache."""
+    return self.__size
+
+  def setMaxBytes(self, maxBytes):
+    with self.__lock:
+      self.__maxBytes = maxBytes
+      self.__evict()
+
+  def get(self, key):
+    """Returns the pattern stored for key and marks it as recently used."""
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry is None:
+        return None
+      self.__entries.move_to_end(key)
+      return entry[0]
+
+  def put(self, key, pattern):
+    """Stores a pattern, evicting the least recently used ones if needed."""
+    with self.__lock:
+      self.__remove(key)
+      nbytes = pattern.nbytes()
+      if nbytes > self.__maxBytes:
+        self.__logger.debug("pattern of %d bytes exceeds the cache", nbytes)
+        return
+      self.__entries[key] = (pattern, nbytes)
+      self.__size += nbytes
+      self.__evict()
+
+  def clear(self):
+    with self.__lock:
+      self.__entries.clear()
+      self.__size = 0
+
+  def __remove(self, key):
+    entry = self.__entries.pop(key, None)
+    if entry is not None:
+      self.__size -= entry[1]
+
+  def __evict(self):
+    while self.__size > self.__maxBytes and self.__entries:
+      key, (pattern, nbytes) = self.__entries.popitem(last=False)
+      self.__size -= nbytes
+
+
+class DiskPatternCache(object):
+  """Compiled patterns kept in memory-mapped files of a cache directory.
+
+  A pattern file starts with PATTERN_FILE_MAGIC and a JSON header holding
+  the image hash, the options and the layout of the pattern on the needle
+  bed. The packed needle rows, the colors per image row and the packed image
+  rows follow as raw arrays, which are mapped instead of being read.
+
+  Files not used for maxAge seconds are removed, and the least recently used
+  ones are removed while the directory holds more than maxBytes.
+  """
+
+  def __init__(self, directory=DEFAULT_CACHE_DIR,
+               maxBytes=DEFAULT_DISK_CACHE_BYTES,
+               maxAge=DEFAULT_DISK_CACHE_AGE):
+    self.__logger = logging.getLogger(type(self).__name__)
+    self.__directory = directory
+    self.__maxBytes = maxBytes
+    self.__maxAge = maxAge
+
+  def directory(self):
+    return self.__directory
+
+  def path(self, key):
+    """Returns the file a pattern with the given key is stored in."""
+    name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(self.__directory, name + PATTERN_FILE_SUFFIX)
+
+  def get(self, key, options):
+    """Returns the ayabImage stored for key, or None.
+
+    Args:
+      key: the key returned by patternKey().
+      options: the configuration dict the pattern was compiled with.
+    """
+    path = self.path(key)
+    if not os.path.exists(path):
+      return None
+    try:
+      header, arrays = readPatternFile(path)
+    except (IOError, OSError, ValueError) as e:
+      self.__logger.warning("removing broken pattern file %s: %s", path, e)
+      self.__remove(path)
+      return None
+
+    if header["key"] != _jsonKey(key):
+      # another pattern with the same file name
+      return None
+
+    # mark as recently used for eviction, not possible on read-only caches
+    try:
+      os.utime(path, None)
+    except OSError as e:
+      self.__logger.debug("could not touch %s: %s", path, e)
+
+    # the conversion code is only loaded once a pattern is needed
+    from .ayab_image import ayabImage
+    from .ayab_pattern import PatternStore
+
+    store = PatternStore.fromArrays(arrays["planes"], arrays["colorCounts"],
+                                    header["width"], arrays["needleRows"],
+                                    header["needleOffset"],
+                                    header["repeat"][0])
+    return ayabImage.fromStore(store, options,
+                               header["knitStartNeedle"],
+                               header["knitStopNeedle"],
+                               header["imgPosition"],
+                               header["repeat"])
+
+  def put(self, key, image):
+    """Writes the compiled ayabImage to the cache directory."""
+    store = image.patternStore()
+    header = {"key": _jsonKey(key),
+              "width": store.width(),
+              "needleOffset": store.needleOffset(),
+              "knitStartNeedle": image.knitStartNeedle(),
+              "knitStopNeedle": image.knitStopNeedle(),
+              "imgPosition": image.imgPosition(),
+              "repeat": list(image.repeat())}
+    arrays = [("needleRows", store.needleRows()),
+              ("colorCounts", store.colorCounts().astype("<i4")),
+              ("planes", store.planes())]
+    try:
+      if not os.path.isdir(self.__directory):
+        os.makedirs(self.__directory)
+      writePatternFile(self.path(key), header, arrays)
+    except (IOError, OSError) as e:
+      self.__logger.warning("could not write pattern file: %s", e)
+      return
+    self.evict()
+
+  def evict(self):
+    """Removes files which are too old or exceed the size of the cache."""
+    now = time.time()
+    files = []
+    for name in os.listdir(self.__directory):
+      if not name.endswith(PATTERN_FILE_SUFFIX):
+        continue
+      path = os.path.join(self.__directory, name)
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      if now - stat.st_mtime > self.__maxAge:
+        self.__remove(path)
+      else:
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    size = sum(fileSize for mtime, fileSize, path in files)
+    for mtime, fileSize, path in sorted(files):
+      if size <= self.__maxBytes:
+        break
+      self.__remove(path)
+      size -= fileSize
+
+  def clear(self):
+    if not os.path.isdir(self.__directory):
+      return
+    for name in os.listdir(self.__directory):
+      if name.endswith(PATTERN_FILE_SUFFIX):
+        self.__remove(os.path.join(self.__directory, name))
+
+  def __remove(self, path):
+    try:
+      os.remove(path)
+    except OSError as e:
+      # mapped files can not be removed on Windows
+      self.__logger.debug("could not remove %s: %s", path, e)
+
+
+def _jsonKey(key):
+  """Returns the key as it reads back from a JSON header."""
+  return json.loads(json.dumps(list(key)))
+
+
+def writePatternFile(path, header, arrays):
+  """Writes a header dict and named arrays to a pattern file.
+
+  The file is written next to path first and then moved in place, so a
+  reader never maps a partially written file.
+  """
+  import numpy as np
+
+  header = dict(header)
+  header["arrays"] = []
+  arrays = [(name, np.ascontiguousarray(array)) for name, array in arrays]
+  size = 0
+  for name, array in arrays:
+    header["arrays"].append([name, array.dtype.str, list(array.shape), size])
+    size += _aligned(array.nbytes)
+
+  headerBytes = json.dumps(header).encode("utf-8")
+  start = _aligned(len(PATTERN_FILE_MAGIC) + _HEADER_LENGTH.size
+                   + len(headerBytes))
+
+  fd, tmpPath = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+  try:
+    with os.fdopen(fd, "wb") as f:
+      f.write(PATTERN_FILE_MAGIC)
+      f.write(_HEADER_LENGTH.pack(len(headerBytes)))
+      f.write(headerBytes)
+      for (name, array), (_, _, _, offset) in zip(arrays, header["arrays"]):
+        f.seek(start + offset)
+        f.write(array.tobytes())
+      f.truncate(start + size)
+    os.replace(tmpPath, path)
+  except Exception:
+    os.remove(tmpPath)
+    raise
+
+
+def readPatternFile(path):
+  """Reads a pattern file.
+
+  Returns:
+    tuple: the header dict and a dict of read-only arrays mapped from the
+    file.
+  """
+  import numpy as np
+
+  with open(path, "rb") as f:
+    if f.read(len(PATTERN_FILE_MAGIC)) != PATTERN_FILE_MAGIC:
+      raise ValueError("not a pattern file")
+    length, = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+    header = json.loads(f.read(length).decode("utf-8"))
+  start = _aligned(len(PATTERN_FILE_MAGIC) + _HEADER_LENGTH.size + length)
+
+  arrays = {}
+  for name, dtype, shape, offset in header.pop("arrays"):
+    if int(np.prod(shape)) == 0:
+      arrays[name] = np.zeros(shape, dtype=dtype)
+    else:
+      arrays[name] = np.memmap(path, dtype=dtype, mode="r",
+                               offset=start + offset, shape=tuple(shape))
+  return header, arrays
+
+
+def _aligned(size):
+  return -(-size // _ARRAY_ALIGNMENT) * _ARRAY_ALIGNMENT
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Handles the serial communication protocol.
+
+AyabCommunication uses an internal PySerial.Serial object to connect to the device.
+The initializer can also be overriden with a dummy serial object.
+
+Messages are sent right away. Received bytes are read by a thread of their
+own, which decodes the SLIP frames as they arrive and queues the messages,
+so receive() blocks until a message is there instead of polling the port.
+"""
+
+import sliplib
+
+import logging
+import queue
+import threading
+
+# queued by the reader when it stops
+_CLOSED = object()
+
+
+def reqStartFrame(startNeedle, stopNeedle, continuousReporting):
+  """Returns the SLIP frame of a start message."""
+  data = bytearray()
+  data.append(0x01)
+  data.append(startNeedle)
+  data.append(stopNeedle)
+  data.append(continuousReporting)
+  return sliplib.encode(bytes(data))
+
+
+def reqInfoFrame():
+  """Returns the SLIP frame of a request for information."""
+  return sliplib.encode(b'\x03')
+
+
+def reqTestFrame():
+  return sliplib.encode(b'\x04')
+
+
+def _crc8Table():
+  """Returns the CRC-8 of every byte, reflected polynomial 0x8C."""
+  table = bytearray(256)
+  for byte in range(256):
+    crc = byte
+    for bit in range(8):
+      crc = (crc >> 1) ^ 0x8C if crc & 0x01 else crc >> 1
+    table[byte] = crc
+  return bytes(table)
+
+
+# CRC-8 of the controller firmware (Dallas/Maxim), initial value 0
+_CRC8_TABLE = _crc8Table()
+
+
+def computeCrc8(data, crc=0x00):
+  """Returns the CRC-8 of data, continuing from crc."""
+  for byte in bytes(data):
+    crc = _CRC8_TABLE[crc ^ byte]
+  return crc
+
+
+def checkCrc8(msg):
+  """Returns True if the last byte of msg is the CRC-8 of the bytes before.
+
+  The CRC-8 of data followed by its CRC-8 is 0.
+  """
+  return len(msg) > 1 and computeCrc8(msg) == 0
+
+
+# CRC-8 deltas of the line number, by number of bytes following it
+_crc8Deltas = {}
+
+
+def _lineNumberCrc8Deltas(numFollowing):
+  """Returns the CRC-8 change of every line number in a cnfLine message.
+
+  The CRC-8 is linear, so the CRC-8 of a message with line number n is
+  the CRC-8 with line number 0 xor the CRC-8 of n followed by zeros.
+  """
+  deltas = _crc8Deltas.get(numFollowing)
+  if deltas is None:
+    zeros = bytes(numFollowing)
+    deltas = bytes(computeCrc8(zeros, _CRC8_TABLE[n]) for n in range(256))
+    _crc8Deltas[numFollowing] = deltas
+  return deltas
+
+
+def cnfLineFrame(lineNumber, lineData, flags, crc8=None):
+  """Returns the SLIP frame of a line of data, see cnf_line()."""
+  data = bytearray()
+  data.append(0x42)
+  data.append(lineNumber)
+  # rows of a pattern may be views which are not contiguous
+  data.extend(bytes(lineData))
+  data.append(flags)
+  if crc8 is None:
+    crc8 = computeCrc8(data)
+  data.append(crc8)
+  return sliplib.encode(bytes(data))
+
+
+# the line number follows the leading END and the message id
+_LINE_NUMBER_OFFSET = len(sliplib.END) + 1
+# the CRC-8 precedes the trailing END
+_CRC8_OFFSET = -1 - len(sliplib.END)
+# bytes which are escaped in a frame
+_ESCAPED = {sliplib.END[0]: sliplib.ESC + sliplib.ESC_END,
+            sliplib.ESC[0]: sliplib.ESC + sliplib.ESC_ESC}
+
+
+class LineFrame(object):
+  """A cnfLine frame, SLIP encoded before the line is requested.
+
+  The frame and its CRC-8 are computed for line number 0. Sending it for
+  another line only patches the line number and the CRC-8 in place, the
+  CRC-8 is corrected through a table. A copy is made if one of them is
+  one of the two bytes which have to be escaped.
+
+  Attributes:
+    color (int): The color of the line.
+    imgRow (int): The image row of the line.
+    lastLine (bool): If the line is the last one of the pattern.
+  """
+
+  __slots__ = ("color", "imgRow", "lastLine", "__frame", "__crc8",
+               "__deltas")
+
+  def __init__(self, lineData, flags, color=0, imgRow=0, lastLine=False):
+    self.color = color
+    self.imgRow = imgRow
+    self.lastLine = lastLine
+    msg = bytearray()
+    msg.append(0x42)
+    msg.append(0)
+    msg.extend(bytes(lineData))
+    msg.append(flags)
+    self.__crc8 = computeCrc8(msg)
+    # payload and flags follow the line number
+    self.__deltas = _lineNumberCrc8Deltas(len(msg) - 2)
+    # room for the CRC-8 before the trailing END
+    frame = sliplib.encode(bytes(msg))
+    self.__frame = bytearray(frame[:-len(sliplib.END)] + b'\x00'
+                             + sliplib.END)
+
+  def frame(self, lineNumber):
+    """Returns the frame answering a request for lineNumber.
+
+    The frame returned is changed by the next call.
+    """
+    crc = self.__crc8 ^ self.__deltas[lineNumber]
+    frame = self.__frame
+    if lineNumber in _ESCAPED or crc in _ESCAPED:
+      return frame[:_LINE_NUMBER_OFFSET] \
+        + _ESCAPED.get(lineNumber, bytes([lineNumber])) \
+        + frame[_LINE_NUMBER_OFFSET + 1:_CRC8_OFFSET] \
+        + _ESCAPED.get(crc, bytes([crc])) + frame[_CRC8_OFFSET + 1:]
+    frame[_LINE_NUMBER_OFFSET] = lineNumber
+    frame[_CRC8_OFFSET] = crc
+    return frame
+
+
+class _SerialReader(threading.Thread):
+  """Reads from a serial port and queues the decoded SLIP frames."""
+
+  def __init__(self, serial, messages):
+    super(_SerialReader, self).__init__(name="AyabSerialReader")
+    self.daemon = True
+    self.__logger = logging.getLogger(type(self).__name__)
+    self.__ser = serial
+    self.__messages = messages
+    self.__driver = sliplib.Driver()
+    self.__stopped = False
+
+  def stop(self):
+    """Stops reading, ending a read that waits for data."""
+    self.__stopped = True
+    if hasattr(self.__ser, "cancel_read"):
+      self.__ser.cancel_read()
+
+  def run(self):
+    try:
+      while not self.__stopped:
+        # waits for the first byte, then takes whatever else arrived
+        data = self.__ser.read(max(1, self.__ser.in_waiting))
+        # an empty read, as after cancel_read(), would end the frame
+        if data:
+          for message in self.__driver.receive(data):
+            self.__messages.put(message)
+    except (IOError, ValueError) as e:
+      if not self.__stopped:
+        self.__logger.error("reading from serial port failed: " + str(e))
+    finally:
+      self.__messages.put(_CLOSED)
+
+
+class AyabCommunication(object):
+  """Class Handling the serial communication protocol."""
+
+  def __init__(self, serial=None):
+    """Creates an AyabCommunication object, with an optional serial-like object."""
+    logging.basicConfig(level=logging.DEBUG)
+    self.__logger = logging.getLogger(type(self).__name__)
+    self.__ser = serial
+    self.__rxMsgQueue = queue.Queue()
+    self.__reader = None
+    if serial is not None:
+      self.__startReader()
+
+  def __del__(self):
+    """Handles on delete behaviour closing serial port object."""
+    self.close_serial()
+
+  def open_serial(self, pPortname=None):
+    """Opens serial port communication with a portName."""
+    if not self.__ser:
+      self.__portname = pPortname
+      # pyserial is only loaded once a port is opened
+      import serial
+      try:
+          # reads wait for data, close_serial() cancels them
+          self.__ser = serial.Serial(self.__portname, 115200)
+      except:
+        self.__logger.error("could not open serial port " + self.__portname)
+        raise CommunicationException()
+      self.__startReader()
+      return True
+
+  def close_serial(self):
+    """Closes serial port."""
+    self.__stopReader()
+    if self.__ser is not None and self.__ser.isOpen() is True:
+        try:
+            self.__ser.close()
+            del(self.__ser)
+            self.__ser = None
+            self.__logger.info("Closing Serial port successful.")
+        except:
+            self.__logger.warning("Closing Serial port failed. Was it ever open?")
+
+  def __startReader(self):
+    self.__rxMsgQueue = queue.Queue()
+    self.__reader = _SerialReader(self.__ser, self.__rxMsgQueue)
+    self.__reader.start()
+
+  def __stopReader(self):
+    if self.__reader is not None:
+      self.__reader.stop()
+      self.__reader.join()
+      self.__reader = None
+
+  def receive(self, timeout=None):
+    """Waits for the next message from the controller.
+
+    Args:
+      timeout (float, optional): Seconds to wait, None waits until a
+        message arrives or interrupt() is called.
+
+    Returns:
+      bytes: The decoded message, or None if the wait timed out or was
+        interrupted.
+
+    Raises:
+      CommunicationException: If the serial port was closed or failed.
+    """
+    try:
+      msg = self.__rxMsgQueue.get(timeout=timeout)
+    except queue.Empty:
+      return None
+    if msg is _CLOSED:
+      # later calls fail as well
+      self.__rxMsgQueue.put(_CLOSED)
+      raise CommunicationException("serial port closed")
+    return msg
+
+  def interrupt(self):
+    """Makes a waiting receive() return None, for example to cancel."""
+    self.__rxMsgQueue.put(None)
+
+  def req_start(self, startNeedle, stopNeedle, continuousReporting):
+      """Sends a start message to the controller."""
+      self.__ser.write(reqStartFrame(startNeedle, stopNeedle,
+                                     continuousReporting))
+
+  def req_info(self):
+      """Sends a request for information to controller."""
+      self.__ser.write(reqInfoFrame())
+
+  def req_test(self):
+      """"""
+      self.__ser.write(reqTestFrame())
+
+  def cnf_line(self, lineNumber, lineData, flags, crc8=None):
+      """Sends a line of data via the serial port.
+
+      Sends a line of data to the serial port.
+      The data sent here is parsed by the Arduino controller which sets the
+      knitting needles accordingly.
+
+      Args:
+        lineNumber (int): The line number to be sent.
+        lineData (bytes): The bytearray to be sent to needles.
+        flags (bytes): The flags sent to the controller.
+        crc8 (int, optional): The CRC-8 checksum for transmission, computed
+          if not given.
+
+      """
+      self.__ser.write(cnfLineFrame(lineNumber, lineData, flags, crc8))
+
+  def cnf_line_frame(self, lineNumber, lineFrame):
+      """Sends a line encoded in advance as LineFrame, in a single write."""
+      self.__ser.write(lineFrame.frame(lineNumber))
+
+
+class CommunicationException(Exception):
+  pass
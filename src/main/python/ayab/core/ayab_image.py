@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+#This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+from PIL import Image
+import numpy as np
+
+from .ayab_pattern import PatternStore, LINE_BYTES, needleMask
+from .ayab_planner import findPlan
+
+
+def compileImage(pil_image, pOptions):
+  """
+  returns the ayabImage knitting pil_image with the given configuration
+  """
+  #Start to knit with the bottom first
+  image = ayabImage(pil_image.rotate(180), pOptions)
+  image.repeatImage(*pOptions.get("repeat", (1, 1)))
+
+  if pOptions.get("start_needle") and pOptions.get("stop_needle"):
+    image.setKnitNeedles(pOptions.get("start_needle"),
+                         pOptions.get("stop_needle"))
+  if pOptions.get("alignment"):
+    image.setImagePosition(pOptions.get("alignment"))
+  return image
+
+
+class ayabImage(object):
+  def __init__(self, pil_image, pOptions):
+    self.__initOptions(pOptions)
+
+    self.__image = pil_image
+
+    self.__image = self.__image.convert('L') # convert to 1 byte depth
+    self.__updateImageData()
+
+  @classmethod
+  def fromStore(cls, store, pOptions, pKnitStart=0, pKnitStop=199,
+                pImgPosition='center', pRepeat=(1, 1)):
+    """
+    creates an image from a compiled PatternStore, without the source image
+    """
+    image = cls.__new__(cls)
+    image.__initOptions(pOptions)
+    image.__knitStartNeedle = pKnitStart
+    image.__knitStopNeedle  = pKnitStop
+    image.__imgPosition     = pImgPosition
+
+    image.__image = None
+    image.__pixels = None
+    image.__store = store
+    image.__repeat = tuple(pRepeat)
+    image.__updateSize(store.width(), store.height())
+    image.__updateNeedles()
+    return image
+
+  def __initOptions(self, pOptions):
+    self.__numColors = pOptions["num_colors"]
+    self.__knitting_mode = pOptions["knitting_mode"]
+    self.__infRepeat = pOptions["inf_repeat"]
+
+    self.__imgPosition    = 'center'
+    self.__imgStartNeedle = '0'
+    self.__imgStopNeedle  = '0'
+
+    self.__knitStartNeedle = 0
+    self.__knitStopNeedle  = 199
+
+    self.__startLine  = 0
+
+    # horizontal and vertical repeats of the image
+    self.__repeat = (1, 1)
+
+  def imageIntern(self):
+    horizontal, vertical = self.__repeat
+    return np.tile(self.patternStore().colorMap(), (vertical, horizontal))
+
+  def imageExpanded(self):
+    horizontal, vertical = self.__repeat
+    return np.tile(self.patternStore().expanded(), (vertical, horizontal))
+
+  def imageColors(self):
+    horizontal, vertical = self.__repeat
+    return np.tile(self.patternStore().colorCounts(), (vertical, 1)) \
+      * horizontal
+
+  def patternStore(self):
+    """
+    returns the PatternStore placed on the needles, rebuilding what changed
+    """
+    if self.__store is None:
+      self.__convertImgToIntern()
+    self.__store.placeOnNeedles(self.imgStartNeedle(), self.__repeat[0])
+    return self.__store
+
+  def nbytes(self):
+    """
+    returns the amount of memory held by the image, its pattern and the
+    schedule of its lines, planning it if needed
+    """
+    size = self.patternStore().nbytes() + self.schedule().nbytes()
+    if self.__pixels is not None:
+      size += self.__pixels.nbytes
+    if self.__image is not None:
+      # the source image keeps its own copy of the pixels
+      width, height = self.__image.size
+      size += width * height * len(self.__image.getbands())
+    return size
+
+  def repeat(self):
+    """
+    returns how many times the image is repeated horizontally and vertically
+    """
+    return self.__repeat
+
+  def imgWidth(self):
+    return self.__imgWidth
+
+  def imgHeight(self):
+    return self.__imgHeight
+
+  def knitStartNeedle(self):
+    return self.__knitStartNeedle
+
+  def knitStopNeedle(self):
+    return self.__knitStopNeedle
+
+  def imgStartNeedle(self):
+    return self.__imgStartNeedle
+
+  def imgStopNeedle(self):
+    return self.__imgStopNeedle
+
+  def imgPosition(self):
+    return self.__imgPosition
+
+  def startLine(self):
+    return self.__startLine
+
+  def numColors(self):
+    return self.__numColors
+
+  def knittingMode(self):
+    return self.__knitting_mode
+
+  def infRepeat(self):
+    return self.__infRepeat
+
+  def pattern(self):
+    """
+    returns the colors, needle bytes and image rows of all lines to knit
+    """
+    colorRow = []
+    byteRow = []
+    imageRow = []
+    for color, bytes, imgRow in self.lines():
+      colorRow.append(color)
+      byteRow.append(bytes)
+      imageRow.append(imgRow)
+    return colorRow, byteRow, imageRow
+
+  def schedule(self):
+    """
+    returns the Schedule of the lines to knit, worked out for all lines at once
+    """
+    if self.__schedule is None:
+      self.__schedule = self.__planSchedule()
+    return self.__schedule
+
+  def lines(self):
+    """
+    generates the lines to knit as (color, bytes, imgRow), one at a time
+    """
+    schedule = self.schedule()
+    store = self.patternStore()
+
+    blankRow = np.zeros(LINE_BYTES, dtype=np.uint8)
+    blankRow.flags.writeable = False
+
+    imgStartNeedle, imgStopNeedle = self.__clippedImgNeedles()
+    mask = needleMask(imgStartNeedle, imgStopNeedle)
+
+    for line in range(len(schedule)):
+      if schedule.blank[line]:
+        bytes = blankRow
+      else:
+        bytes = store.needleRow(schedule.index[line])
+
+      # set the needles outside of the image
+      if schedule.masked[line]:
+        bytes = bytes | mask
+
+      yield int(schedule.color[line]), bytes, int(schedule.imgRow[line])
+
+  def __clippedImgNeedles(self):
+    imgStartNeedle = self.imgStartNeedle()
+    if imgStartNeedle < 0:
+        imgStartNeedle = 0
+
+    imgStopNeedle = self.imgStopNeedle()
+    if imgStopNeedle > 199:
+        imgStopNeedle = 199
+    return imgStartNeedle, imgStopNeedle
+
+  def __planSchedule(self):
+    passPlan = findPlan(self.__knitting_mode, self.__numColors)
+    if passPlan is None:
+      raise ValueError("{0} colors can not be knitted in knitting mode {1}"
+                       .format(self.__numColors, self.__knitting_mode))
+
+    schedule = passPlan.schedule(self.__numColors, self.__imgHeight,
+                                 self.__startLine)
+    # modes that do not wrap around run past the image when starting late
+    store = self.patternStore()
+    schedule = schedule.select(
+      schedule.index < self.__imgHeight * self.__numColors)
+    # rows of a vertical repeat map back to the stored image
+    schedule.index %= store.numRows()
+    if not passPlan.skipEmptyPairs:
+      return schedule
+
+    # a line is empty if no needle gets set
+    imgStartNeedle, imgStopNeedle = self.__clippedImgNeedles()
+    maskEmpty = imgStartNeedle <= 0 and imgStopNeedle >= 199
+    rowEmpty = ~store.needleRows().any(axis=1)
+    empty = (schedule.blank | rowEmpty[schedule.index]) \
+      & ~(schedule.masked & (not maskEmpty))
+
+    # two empty lines of the same color in a row are skipped,
+    # as the carriage would just go there and back
+    keep = np.ones(len(schedule), dtype=bool)
+    emptyLines = []
+    previous = -2
+    for line in np.flatnonzero(empty):
+      if line != previous + 1:
+        # a knitted line lies in between
+        emptyLines = []
+      previous = line
+      if emptyLines and \
+          schedule.color[emptyLines[-1]] == schedule.color[line]:
+        keep[emptyLines.pop()] = False
+        keep[line] = False
+      else:
+        emptyLines.append(line)
+    return schedule.select(keep)
+
+  # Each input only invalidates the stages depending on it, the stages are
+  # rebuilt once they are needed:
+  #   image   -> pixels (decoded)
+  #   colors  -> store (distilled and packed)
+  #   needles -> needle rows (store shifted onto the bed) and schedule
+
+  def __updateImageData(self):
+    self.__pixels = np.asarray(self.__image, dtype=np.uint8)
+    self.__updateSize(*self.__image.size)
+    self.__updateColors()
+
+  def __updateSize(self, width, height):
+    horizontal, vertical = self.__repeat
+    self.__imgWidth   = width * horizontal
+    self.__imgHeight  = height * vertical
+
+  def __sourcePixels(self):
+    if self.__pixels is None:
+      raise ValueError("a compiled pattern has no source image to transform")
+    return self.__pixels
+
+  def __setPixels(self, pixels):
+    """
+    replaces the image by the given array of pixels, keeping the image mode
+    """
+    self.__image = Image.fromarray(pixels, self.__image.mode)
+    self.__pixels = pixels
+    self.__updateSize(*self.__image.size)
+    self.__updateColors()
+
+  def __materializeRepeat(self):
+    """
+    replaces the image by its repeats, for transforms not commuting with them
+    """
+    horizontal, vertical = self.__repeat
+    if (horizontal, vertical) != (1, 1):
+      pixels = np.tile(self.__sourcePixels(), (vertical, horizontal))
+      self.__repeat = (1, 1)
+      self.__setPixels(pixels)
+
+  def __updateColors(self):
+    self.__store = None
+    self.__updateNeedles()
+
+  def __updateNeedles(self):
+    self.__calcImgStartStopNeedles()
+    self.__schedule = None
+
+
+  def __colorLookupTable(self, num_colors):
+    """
+    returns a table mapping every gray value to the color it is distilled to
+    """
+    clr_range  = float(256)/num_colors
+
+    table = np.zeros(256, dtype=np.uint8)
+    for color in range(0, num_colors):
+      lowerBound = int(color*clr_range)
+      upperBound = int((color+1)*clr_range)
+      table[lowerBound:upperBound] = color
+    return table
+
+  def __convertImgToIntern(self):
+    num_colors = self.__numColors
+
+    # Distill image to x colors
+    colorMap = self.__colorLookupTable(num_colors)[self.__pixels]
+
+    self.__store = PatternStore(colorMap, num_colors)
+
+  def __calcImgStartStopNeedles(self):
+    if self.__imgPosition == 'center':
+        needleWidth = (self.__knitStopNeedle - self.__knitStartNeedle) +1
+        self.__imgStartNeedle = (self.__knitStartNeedle + needleWidth/2) - self.__imgWidth/2
+        self.__imgStopNeedle  = self.__imgStartNeedle + self.__imgWidth -1
+
+    elif self.__imgPosition == 'left':
+        self.__imgStartNeedle = self.__knitStartNeedle
+        self.__imgStopNeedle  = self.__imgStartNeedle + self.__imgWidth
+
+    elif self.__imgPosition == 'right':
+        self.__imgStopNeedle  = self.__knitStopNeedle
+        self.__imgStartNeedle = self.__imgStopNeedle - self.__imgWidth
+
+    elif int(self.__imgPosition) > 0 and int(self.__imgPosition) < 200:
+        self.__imgStartNeedle = int(self.__imgPosition)
+        self.__imgStopNeedle  = self.__imgStartNeedle + self.__imgWidth
+
+    else:
+        return False
+    return True
+
+  def setNumColors(self, pNumColors):
+      """
+      sets the number of colors the be used for knitting
+      """
+      if pNumColors > 1 and pNumColors < 7:
+        if self.__pixels is None:
+          raise ValueError("colors of a compiled pattern can not be changed")
+        self.__numColors      = pNumColors
+        self.__updateColors()
+      return
+
+  def invertImage(self):
+      """
+      invert the pixels of the image
+      """
+      self.__setPixels(255 - self.__sourcePixels())
+      return
+
+
+  def rotateImage(self):
+      """
+      rotate the image 90 degrees clockwise
+      """
+      self.__sourcePixels()
+      self.__materializeRepeat()
+      self.__image = self.__image.rotate(-90)
+
+      self.__updateImageData()
+      return
+
+
+  def resizeImage(self, pNewWidth):
+      """
+      resize the image to a given width, keeping the aspect ratio
+      """
+      self.__sourcePixels()
+      self.__materializeRepeat()
+      wpercent = (pNewWidth/float(self.__image.size[0]))
+      hsize = int((float(self.__image.size[1])*float(wpercent)))
+      # LANCZOS is the filter formerly called ANTIALIAS
+      self.__image = self.__image.resize((pNewWidth,hsize), Image.LANCZOS)
+
+      self.__updateImageData()
+      return
+
+  def repeatImage(self, pHorizontal=1, pVertical=1):
+      """
+      Repeat image.
+      Repeat pHorizontal times horizontally, pVertical times vertically
+      Sturla Lange 2017-12-30
+
+      The image is stored once, rows and needles of the repeats are mapped
+      back to it while knitting.
+      """
+      pixels = self.__sourcePixels()
+      horizontal, vertical = self.__repeat
+      self.__repeat = (horizontal * pHorizontal, vertical * pVertical)
+      self.__updateSize(pixels.shape[1], pixels.shape[0])
+      self.__updateNeedles()
+      return
+
+
+  def setKnitNeedles(self, pKnitStart, pKnitStop):
+      """
+      set the start and stop needle
+      """
+      if (pKnitStart < pKnitStop) \
+          and pKnitStart >= 0 \
+          and pKnitStop < 200:
+        self.__knitStartNeedle = pKnitStart
+        self.__knitStopNeedle  = pKnitStop
+
+      self.__updateNeedles()
+      return
+
+
+  def setImagePosition(self, pImgPosition):
+      """
+      set the position of the pattern
+      """
+      ok = False
+      if pImgPosition == 'left' \
+            or pImgPosition == 'center' \
+            or pImgPosition == 'right':
+        ok = True
+      elif (int(pImgPosition) >= 0 and int(pImgPosition) < 200):
+        ok = True
+
+      if ok:
+        self.__imgPosition = pImgPosition
+        self.__updateNeedles()
+      return
+
+  def setStartLine(self, pStartLine):
+      """
+      set the line where to start knitting
+      """
+      #Check if StartLine is in valid range (picture height)
+      if pStartLine >= 0 \
+            and pStartLine < self.__imgHeight:
+        self.__startLine = pStartLine
+        self.__schedule = None
+      return
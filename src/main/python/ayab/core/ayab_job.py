@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Compiled knitting jobs.
+
+A job file (.ayabjob) holds every line the controller asks for while
+knitting an image, as it is sent: the 25 byte needle payload, the flags
+byte, the color and the image row. Knitting from a job needs neither Pillow
+nor the image conversion, which all happens when the job is compiled.
+
+The file is little endian: a header followed by one record per line.
+
+  header: magic, version, machine width, knitting mode, colors, infinite
+          repeat, reserved byte, number of lines, image width and height,
+          start line, start and stop needle, CRC-32 of header and records
+  record: payload (machine width / 8 bytes), flags, color, image row
+"""
+
+import struct
+import zlib
+
+JOB_FILE_MAGIC = b"AYABJOB\x01"
+JOB_FILE_VERSION = 1
+JOB_FILE_SUFFIX = ".ayabjob"
+
+# TODO implement for generic machine width
+DEFAULT_MACHINE_WIDTH = 200
+
+_HEADER = struct.Struct("<8sHHBBBBIIIIHHI")
+_RECORD_TAIL = struct.Struct("<BBI")
+
+# flags as sent to the controller with cnfLine
+FLAG_LAST_LINE = 0x01
+FLAG_BLANK_LINE = 0x02
+FLAG_COLOR_SHIFT = 3
+
+
+class JobFileError(Exception):
+  pass
+
+
+class KnitJob(object):
+  """A compiled job, answering line requests straight from the file data.
+
+  It offers the parts of ayabImage needed for knitting, so it can take the
+  place of an image in the LineScheduler and AyabPluginControl.
+  """
+
+  def __init__(self, data):
+    """Parses and verifies the contents of a job file."""
+    data = memoryview(data)
+    if len(data) < _HEADER.size:
+      raise JobFileError("job file is truncated")
+    (magic, version, self.__machineWidth, self.__knittingMode,
+     self.__numColors, self.__infRepeat, _, self.__numLines,
+     self.__imgWidth, self.__imgHeight, self.__startLine,
+     self.__knitStartNeedle, self.__knitStopNeedle,
+     checksum) = _HEADER.unpack_from(data)
+    if magic != JOB_FILE_MAGIC:
+      raise JobFileError("not a job file")
+    if version != JOB_FILE_VERSION:
+      raise JobFileError("unsupported job file version {0}".format(version))
+
+    self.__lineBytes = self.__machineWidth // 8
+    self.__recordSize = self.__lineBytes + _RECORD_TAIL.size
+    end = _HEADER.size + self.__numLines * self.__recordSize
+    if len(data) != end:
+      raise JobFileError("job file has a wrong size")
+    if _checksum(data[:_HEADER.size - 4], data[_HEADER.size:]) != checksum:
+      raise JobFileError("job file checksum mismatch")
+
+    self.__records = data[_HEADER.size:]
+
+  def machineWidth(self):
+    return self.__machineWidth
+
+  def knittingMode(self):
+    return self.__knittingMode
+
+  def numColors(self):
+    return self.__numColors
+
+  def infRepeat(self):
+    return self.__infRepeat
+
+  def numLines(self):
+    return self.__numLines
+
+  def imgWidth(self):
+    return self.__imgWidth
+
+  def imgHeight(self):
+    return self.__imgHeight
+
+  def startLine(self):
+    return self.__startLine
+
+  def knitStartNeedle(self):
+    return self.__knitStartNeedle
+
+  def knitStopNeedle(self):
+    return self.__knitStopNeedle
+
+  def options(self):
+    """Returns the configuration the job was compiled with."""
+    return {"num_colors": self.__numColors,
+            "knitting_mode": self.__knittingMode,
+            "inf_repeat": self.__infRepeat,
+            "start_needle": self.__knitStartNeedle,
+            "stop_needle": self.__knitStopNeedle,
+            "start_line": self.__startLine}
+
+  def line(self, lineNumber):
+    """Returns (color, payload, imgRow, flags) of a line.
+
+    The payload is a memoryview into the job data.
+    """
+    if not 0 <= lineNumber < self.__numLines:
+      raise IndexError("line {0} is not part of the job".format(lineNumber))
+    start = lineNumber * self.__recordSize
+    tail = start + self.__lineBytes
+    flags, color, imgRow = _RECORD_TAIL.unpack_from(self.__records, tail)
+    return color, self.__records[start:tail], imgRow, flags
+
+  def lines(self):
+    """Generates the lines to knit as (color, payload, imgRow)."""
+    for lineNumber in range(self.__numLines):
+      color, payload, imgRow, flags = self.line(lineNumber)
+      yield color, payload, imgRow
+
+
+def _checksum(header, records):
+  return zlib.crc32(records, zlib.crc32(header)) & 0xffffffff
+
+
+def readJob(path):
+  """Reads a job file, raising JobFileError if it is not valid."""
+  with open(path, "rb") as f:
+    return KnitJob(f.read())
+
+
+def encodeJob(image, machineWidth=DEFAULT_MACHINE_WIDTH):
+  """Returns the contents of a job file knitting a configured ayabImage."""
+  lineBytes = machineWidth // 8
+  records = bytearray()
+  numLines = 0
+  previous = None
+  for line in image.lines():
+    if previous is not None:
+      records += _encodeRecord(previous, 0, lineBytes)
+    previous = line
+    numLines += 1
+  if previous is not None:
+    # repeating lines are sent without the last line flag
+    lastFlags = 0 if image.infRepeat() else FLAG_LAST_LINE
+    records += _encodeRecord(previous, lastFlags, lineBytes)
+
+  header = _HEADER.pack(JOB_FILE_MAGIC, JOB_FILE_VERSION, machineWidth,
+                        image.knittingMode(), image.numColors(),
+                        int(image.infRepeat()), 0, numLines,
+                        image.imgWidth(), image.imgHeight(),
+                        image.startLine(), image.knitStartNeedle(),
+                        image.knitStopNeedle(), 0)
+  checksum = _checksum(header[:-4], records)
+  return header[:-4] + struct.pack("<I", checksum) + bytes(records)
+
+
+def _encodeRecord(line, flags, lineBytes):
+  color, payload, imgRow = line
+  payload = bytes(payload)
+  if len(payload) != lineBytes:
+    raise ValueError("line payload does not fit the machine width")
+  return payload + _RECORD_TAIL.pack(flags | color << FLAG_COLOR_SHIFT,
+                                     color, imgRow)
+
+
+def writeJob(path, image, machineWidth=DEFAULT_MACHINE_WIDTH):
+  """Compiles a configured ayabImage into a job file."""
+  data = encodeJob(image, machineWidth)
+  with open(path, "wb") as f:
+    f.write(data)
+  return len(data)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""The messages the controller sends.
+
+Every message starts with its id, which selects the class decoding it from
+MESSAGES. The fields are unpacked straight from the received frame.
+"""
+
+import struct
+
+# names of the carriage types in indState
+CARRIAGE_NAMES = {1: "K Carriage", 2: "L Carriage", 3: "G Carriage"}
+
+
+class Message(object):
+  """A message of the controller, decoded from the fields after its id."""
+
+  __slots__ = ()
+
+  ID = None
+  NAME = None
+  # the fields following the id
+  _FIELDS = struct.Struct("")
+
+  @classmethod
+  def decode(cls, buffer):
+    """Decodes a message from a buffer starting with its id."""
+    return cls(*cls._FIELDS.unpack_from(buffer, 1))
+
+
+class CnfStart(Message):
+  __slots__ = ("success",)
+
+  ID = 0xC1
+  NAME = "cnfStart"
+  _FIELDS = struct.Struct(">B")
+
+  def __init__(self, success):
+    self.success = success
+
+
+class CnfInfo(Message):
+  """The API version, followed by the firmware version from API 5 on."""
+
+  __slots__ = ("api", "firmwareMajor", "firmwareMinor")
+
+  ID = 0xC3
+  NAME = "cnfInfo"
+  _FIELDS = struct.Struct(">BBB")
+  _API = struct.Struct(">B")
+
+  def __init__(self, api, firmwareMajor=None, firmwareMinor=None):
+    self.api = api
+    self.firmwareMajor = firmwareMajor
+    self.firmwareMinor = firmwareMinor
+
+  @classmethod
+  def decode(cls, buffer):
+    if len(buffer) < 1 + cls._FIELDS.size:
+      return cls(*cls._API.unpack_from(buffer, 1))
+    return cls(*cls._FIELDS.unpack_from(buffer, 1))
+
+
+class ReqLine(Message):
+  __slots__ = ("lineNumber",)
+
+  ID = 0x82
+  NAME = "reqLine"
+  _FIELDS = struct.Struct(">B")
+
+  def __init__(self, lineNumber):
+    self.lineNumber = lineNumber
+
+
+class CnfTest(Message):
+  __slots__ = ("success",)
+
+  ID = 0xC4
+  NAME = "cnfTest"
+  _FIELDS = struct.Struct(">B")
+
+  def __init__(self, success):
+    self.success = success
+
+
+class IndState(Message):
+  """The state of the machine, the hall sensor values are big endian."""
+
+  __slots__ = ("ready", "hallLeft", "hallRight", "carriage", "position")
+
+  ID = 0x84
+  NAME = "indState"
+  _FIELDS = struct.Struct(">BHHBB")
+
+  def __init__(self, ready, hallLeft, hallRight, carriage, position):
+    self.ready = ready
+    self.hallLeft = hallLeft
+    self.hallRight = hallRight
+    self.carriage = carriage
+    self.position = position
+
+  def carriageName(self):
+    """Returns the name of the carriage type, empty if not known."""
+    return CARRIAGE_NAMES.get(self.carriage, "")
+
+
+# the message classes by id
+MESSAGES = {cls.ID: cls for cls in (CnfStart, CnfInfo, ReqLine, CnfTest,
+                                    IndState)}
+
+
+class MessageDecoder(object):
+  """Decodes the messages of the controller, counting the unknown ones.
+
+  Messages with an unknown id or too short for their fields are not
+  decoded, only counted.
+  """
+
+  def __init__(self):
+    self.__numUnknown = 0
+
+  def numUnknown(self):
+    """Returns the number of messages which could not be decoded."""
+    return self.__numUnknown
+
+  def decode(self, msg):
+    """Returns the message decoded from a frame, None if it is unknown."""
+    buffer = memoryview(msg)
+    cls = MESSAGES.get(buffer[0]) if len(buffer) else None
+    if cls is not None:
+      try:
+        return cls.decode(buffer)
+      except struct.error:
+        pass
+    self.__numUnknown += 1
+    return None
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Compact storage of a distilled pattern.
+
+A pattern is kept as one bit-plane per color, packed 8 pixels per byte with
+the least significant bit first. This is the bit order the controller expects
+for needles, so a needle row of the machine is a plain 25 byte slice.
+"""
+
+import functools
+import math
+import numpy as np
+
+# TODO implement for generic machine width
+MACHINE_WIDTH = 200
+LINE_BYTES = MACHINE_WIDTH // 8
+
+
+class PatternStore(object):
+  """Bit-planes of a distilled pattern, one per color and image row.
+
+  Plane rows are ordered like the former imageExpanded list: the plane of
+  color c in image row r is found at index r * numColors + c.
+  """
+
+  def __init__(self, colorMap, numColors):
+    """Creates the store from a 2D array holding the color of each pixel."""
+    self.__height, self.__width = colorMap.shape
+    self.__numColors = numColors
+
+    colors = np.arange(numColors, dtype=colorMap.dtype).reshape(1, numColors, 1)
+    planes = colorMap[:, np.newaxis, :] == colors
+
+    # amount of bits per color per line
+    self.__colorCounts = planes.sum(axis=2, dtype=np.intp)
+    # colors separated per line, 8 pixels per byte
+    self.__planes = np.packbits(planes, axis=2, bitorder='little') \
+      .reshape(self.__height * numColors, -1)
+
+    self.__needleOffset = None
+    self.__needleRepeat = 1
+    self.__needleRows = None
+
+  @classmethod
+  def fromArrays(cls, planes, colorCounts, width, needleRows=None,
+                 needleOffset=None, needleRepeat=1):
+    """Creates a store around existing arrays, e.g. mapped from a file.
+
+    The arrays are used as they are, without being copied.
+    """
+    store = cls.__new__(cls)
+    store.__height, store.__numColors = colorCounts.shape
+    store.__width = width
+    store.__planes = planes
+    store.__colorCounts = colorCounts
+    store.__needleOffset = needleOffset
+    store.__needleRepeat = needleRepeat
+    store.__needleRows = needleRows
+    return store
+
+  def width(self):
+    return self.__width
+
+  def height(self):
+    return self.__height
+
+  def numColors(self):
+    return self.__numColors
+
+  def numRows(self):
+    """Returns the number of plane rows (image height times colors)."""
+    return self.__height * self.__numColors
+
+  def nbytes(self):
+    """Returns the amount of memory held by the store."""
+    size = self.__planes.nbytes + self.__colorCounts.nbytes
+    if self.__needleRows is not None:
+      size += self.__needleRows.nbytes
+    return size
+
+  def planes(self):
+    """Returns the packed bit-planes, one row of bytes per plane row."""
+    return self.__planes
+
+  def colorCounts(self):
+    """Returns the amount of pixels per color for every image row."""
+    return self.__colorCounts
+
+  def colorMap(self):
+    """Returns the color of every pixel as a 2D array."""
+    planes = self.expanded().reshape(self.__height, self.__numColors,
+                                     self.__width)
+    return planes.argmax(axis=1).astype(np.uint8)
+
+  def expanded(self):
+    """Returns the bit-planes unpacked to one byte per pixel."""
+    return np.unpackbits(self.__planes, axis=1, count=self.__width,
+                         bitorder='little')
+
+  def placeOnNeedles(self, startNeedle, repeat=1):
+    """Places the pattern on the needle bed, its first pixel on startNeedle.
+
+    The pattern is placed repeat times side by side. Fractional start
+    needles are rounded down, pixels falling outside of the needle bed are
+    dropped.
+    """
+    offset = int(math.floor(startNeedle))
+    if offset == self.__needleOffset and repeat == self.__needleRepeat:
+      return
+
+    planes = self.__planes
+    if repeat > 1:
+      # needles of a repeat map back to the pattern,
+      # only as many pixels as fit onto the bed are packed
+      width = min(self.__width * repeat, max(0, MACHINE_WIDTH - offset))
+      columns = np.arange(width) % self.__width
+      planes = np.packbits(self.expanded()[:, columns], axis=1,
+                           bitorder='little')
+
+    self.__needleRows = shiftRows(planes, offset)
+    self.__needleRows.flags.writeable = False
+    self.__needleOffset = offset
+    self.__needleRepeat = repeat
+
+  def needleOffset(self):
+    """Returns the needle of the first pixel, None if not placed yet."""
+    return self.__needleOffset
+
+  def needleRepeat(self):
+    """Returns how many times the pattern is placed side by side."""
+    return self.__needleRepeat
+
+  def needleRows(self):
+    """Returns all needle rows as a read-only array of 25 byte rows."""
+    return self.__needleRows
+
+  def needleRow(self, index):
+    """Returns the needle row of a plane row, as a view into the store."""
+    return self.__needleRows[index]
+
+
+def shiftRows(rows, offset, numBytes=LINE_BYTES):
+  """Shifts packed rows by offset bits, the first bit landing on bit offset.
+
+  Bits shifted out of the numBytes wide result are dropped, a negative
+  offset drops the first bits of the rows.
+  """
+  numRows = rows.shape[0]
+  quotient, remainder = divmod(offset, 8)
+
+  # zero bytes around the rows stand in for everything outside of them
+  padded = np.zeros((numRows, rows.shape[1] + 2), dtype=np.uint16)
+  padded[:, 1:-1] = rows
+  # byte k holds source byte k - quotient shifted up by remainder bits,
+  # completed by the top bits of the source byte before it
+  source = np.arange(numBytes) - quotient + 1
+  last = padded.shape[1] - 1
+  shifted = (padded[:, np.clip(source, 0, last)] << remainder) \
+    | (padded[:, np.clip(source - 1, 0, last)] >> (8 - remainder))
+  return (shifted & 0xff).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=64)
+def needleMask(startNeedle, stopNeedle, machineWidth=MACHINE_WIDTH):
+  """Returns the packed row setting all needles outside of start..stop.
+
+  Masks are cached, the returned array is read-only.
+  """
+  needles = np.arange(machineWidth)
+  outside = (needles < startNeedle) | (needles > stopNeedle)
+  mask = np.packbits(outside, bitorder='little')
+  mask.flags.writeable = False
+  return mask
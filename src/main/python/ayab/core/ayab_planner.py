@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Pass plans of the knitting modes.
+
+A pass plan decides for every line (one pass of the carriage) which image
+row and which color gets knitted, and whether an empty line is sent instead.
+Plans work on arrays of line numbers, so the schedule of a whole pattern is
+worked out in one step. A new knitting mode is added by registering a plan
+with registerPlan().
+"""
+
+from enum import Enum
+import numpy as np
+
+
+class KnittingMode(Enum):
+    SINGLEBED = 0
+    CLASSIC_RIBBER_1 = 1            # Classic Ribber 1
+    #CLASSIC_RIBBER_2 = 2            # Classic Ribber 2
+    MIDDLECOLORSTWICE_RIBBER = 2    # Middle-Colors-Twice Ribber
+    HEARTOFPLUTO_RIBBER = 3         # Heart-of-Pluto Ribber
+    CIRCULAR_RIBBER = 4             # Circular Ribber
+
+
+class Schedule(object):
+  """Per line arrays of a planned pattern.
+
+  imgRow is the image row knitted, index the plane row of the PatternStore
+  (imgRow * numColors + color), color the color sent, blank marks empty lines
+  and masked marks the lines where needles outside of the image are set.
+  """
+
+  def __init__(self, imgRow, index, color, blank, masked):
+    self.imgRow = imgRow
+    self.index = index
+    self.color = color
+    self.blank = blank
+    self.masked = masked
+
+  def __len__(self):
+    return len(self.imgRow)
+
+  def nbytes(self):
+    """Returns the amount of memory held by the arrays."""
+    return self.imgRow.nbytes + self.index.nbytes + self.color.nbytes \
+      + self.blank.nbytes + self.masked.nbytes
+
+  def select(self, lines):
+    """Returns the schedule of the selected lines only."""
+    return Schedule(self.imgRow[lines], self.index[lines], self.color[lines],
+                    self.blank[lines], self.masked[lines])
+
+
+class PassPlan(object):
+  """Describes how a knitting mode knits the rows of an image.
+
+  Args:
+    plan: function(lines, numColors, imgHeight, startLine) returning the
+      arrays (imgRow, index, color, blank) for an array of line numbers.
+    acceptsColors: function(numColors) telling if the plan supports the
+      amount of colors.
+    maskedColor: function(numColors) returning the color whose lines also
+      set all needles outside of the image, or None.
+    skipEmptyPairs: whether two empty lines of the same color in a row are
+      left out, as the carriage would just go there and back.
+  """
+
+  def __init__(self, plan, acceptsColors, maskedColor=None,
+               skipEmptyPairs=True):
+    self.__plan = plan
+    self.__acceptsColors = acceptsColors
+    self.__maskedColor = maskedColor
+    self.skipEmptyPairs = skipEmptyPairs
+
+  def accepts(self, numColors):
+    return self.__acceptsColors(numColors)
+
+  def numLines(self, numColors, imgHeight):
+    return numColors * imgHeight
+
+  def schedule(self, numColors, imgHeight, startLine=0):
+    """Returns the Schedule of every line of the pattern."""
+    lines = np.arange(self.numLines(numColors, imgHeight), dtype=np.intp)
+    imgRow, index, color, blank = \
+      self.__plan(lines, numColors, imgHeight, startLine)
+
+    imgRow = _perLine(imgRow, lines, np.intp)
+    index = _perLine(index, lines, np.intp)
+    color = _perLine(color, lines, np.intp)
+    blank = _perLine(blank, lines, bool)
+
+    if self.__maskedColor is None:
+      masked = np.zeros(len(lines), dtype=bool)
+    else:
+      masked = color == self.__maskedColor(numColors)
+    return Schedule(imgRow, index, color, blank, masked)
+
+
+def _perLine(values, lines, dtype):
+  """Returns values as an array with one entry per line."""
+  return np.broadcast_to(np.asarray(values, dtype=dtype), lines.shape).copy()
+
+
+_plans = {}
+
+
+def registerPlan(knittingMode, passPlan):
+  """Registers a PassPlan for a knitting mode.
+
+  Several plans may be registered for one mode, the first one accepting
+  the amount of colors is used.
+  """
+  _plans.setdefault(KnittingMode(knittingMode), []).append(passPlan)
+
+
+def findPlan(knittingMode, numColors):
+  """Returns the PassPlan knitting numColors in knittingMode, or None."""
+  for passPlan in _plans.get(KnittingMode(knittingMode), []):
+    if passPlan.accepts(numColors):
+      return passPlan
+  return None
+
+
+def _singlebed(lines, numColors, imgHeight, startLine):
+  # color is always 0 in singlebed,
+  # because both colors are knitted at once
+  imgRow = (lines + startLine) % imgHeight
+
+  # 0   1   2   3   4 .. (imgRow)
+  # |   |   |   |   |
+  # 0 1 2 3 4 5 6 7 8 .. (imageExpanded)
+  return imgRow, imgRow * 2, 0, False
+
+
+def _classicRibber2Colors(lines, numColors, imgHeight, startLine):
+  imgRow = (lines // 2 + startLine) % imgHeight
+
+  # 0 0 1 1 2 2 3 3 4 4 .. (imgRow)
+  # 0 1 2 3 4 5 6 7 8 9 .. (lineNumber)
+  # | |  X  | |  X  | |
+  # 0 1 3 2 4 5 7 6 8 9 .. (imageExpanded)
+  # A B B A A B B A A B .. (color)
+  phase = lines % 4
+  color = ((phase == 1) | (phase == 2)).astype(np.intp)
+
+  # decide if lineNumber has to be switched or not
+  swap = np.array([0, 0, 1, -1])[phase]
+  index = (startLine * 2 + lines + swap) % (2 * imgHeight)
+  return imgRow, index, color, False
+
+
+def _classicRibberMulticolor(lines, numColors, imgHeight, startLine):
+  imgRow = (lines // (numColors * 2) + startLine) % imgHeight
+  color = (lines // 2) % numColors
+  index = (imgRow * numColors + color) % (numColors * imgHeight)
+  return imgRow, index, color, lines % 2 == 1
+
+
+def _middleColorsTwice(lines, numColors, imgHeight, startLine):
+  # 0-00 1-11 2-22 3-33 4-44 5-55 .. (imgRow)
+  # 0123 4567 8911 1111 1111 2222.. (lineNumber)
+  #             01 2345 6789 0123
+  #
+  # 0-21 4-53 6-87 1-19 1-11 1-11 .. (imageExpanded)
+  #                0 1  2 43 6 75
+  #
+  # A-CB B-CA A-CB B-CA A-CB B-CA .. (color)
+
+  # Double the line minus the 2 you save on the beg and end of each imgRow
+  passesPerRow = numColors * 2 - 2
+
+  imgRow = startLine + lines // passesPerRow
+  phase = lines % passesPerRow
+  color = np.where(imgRow % 2 != 0,
+                   (phase + 1) // 2,
+                   (passesPerRow - phase) // 2)
+
+  blank = (phase != 0) & ((lines + 1) % passesPerRow != 0) & (lines % 2 != 0)
+  return imgRow, imgRow * numColors + color, color, blank
+
+
+def _heartOfPluto(lines, numColors, imgHeight, startLine):
+  # advances imgRow as soon as possible
+  # Double the line minus the 2 you save from early advancing to next row
+  passesPerRow = numColors * 2 - 2
+
+  imgRow = startLine + lines // passesPerRow
+
+  # check if it's time to send a blank line
+  blank = (lines % passesPerRow != 0) & (lines % 2 == 0)
+
+  # if not set a color, blank lines keep the color of the line before
+  color = numColors - 1 - ((lines + 1) % (numColors * 2)) // 2
+  colorLine = np.maximum.accumulate(np.where(blank, 0, lines))
+  color = color[colorLine]
+  return imgRow, imgRow * numColors + color, color, blank
+
+
+def _circularRibber(lines, numColors, imgHeight, startLine):
+  imgRow = (lines // 4 + startLine) % imgHeight
+
+  # Color      A B  A B  A B
+  # ImgRow     0-0- 1-1- 2-2-
+  # Index2Send 0 1  2 3  4 5
+  # LineNumber 0123 4567 8911
+  #                        01
+  index = (startLine * numColors + lines // 2) % (numColors * imgHeight)
+  # circular knitting does not pick a color per line,
+  # it keeps sending the last color
+  return imgRow, index, numColors - 1, lines % 2 == 1
+
+
+registerPlan(KnittingMode.SINGLEBED,
+             PassPlan(_singlebed, lambda numColors: numColors == 2,
+                      skipEmptyPairs=False))
+registerPlan(KnittingMode.CLASSIC_RIBBER_1,
+             PassPlan(_classicRibber2Colors, lambda numColors: numColors == 2,
+                      maskedColor=lambda numColors: 0))
+registerPlan(KnittingMode.CLASSIC_RIBBER_1,
+             PassPlan(_classicRibberMulticolor, lambda numColors: numColors > 2,
+                      maskedColor=lambda numColors: 0))
+registerPlan(KnittingMode.MIDDLECOLORSTWICE_RIBBER,
+             PassPlan(_middleColorsTwice, lambda numColors: numColors >= 2,
+                      maskedColor=lambda numColors: numColors - 1))
+registerPlan(KnittingMode.HEARTOFPLUTO_RIBBER,
+             PassPlan(_heartOfPluto, lambda numColors: numColors >= 2,
+                      maskedColor=lambda numColors: numColors - 1))
+registerPlan(KnittingMode.CIRCULAR_RIBBER,
+             PassPlan(_circularRibber, lambda numColors: numColors == 2,
+                      skipEmptyPairs=False))
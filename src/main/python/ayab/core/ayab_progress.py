@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Coalesces the events a KnitSession reports for every line.
+
+A session reports the progress, the color and a sound for every line it
+sends, and the carriage state for every indState of continuous reporting.
+Showing each of them costs the GUI a repaint. The ProgressAggregator keeps
+only the latest of these events and hands them on from a thread of its own,
+at most a given number of times per second.
+"""
+
+import threading
+import time
+
+from .ayab_session import KnitListener
+
+DEFAULT_RATE = 30
+MIN_RATE = 10
+MAX_RATE = 60
+
+# coalesced events, in the order they are delivered
+_COALESCED = ("updateColor", "updateProgress", "updateStatus", "playsound")
+
+
+class ProgressAggregator(KnitListener):
+  """Passes the events of a KnitSession on to a listener, rate limited.
+
+  Progress, color, carriage state and the "nextline" sound are stored and
+  delivered rate times per second at most. All other events are passed on
+  right away, after the stored ones, so the listener sees them in order.
+  The session thread only stores events and never waits for the listener
+  to show them, unless an event is passed on right away.
+
+  Args:
+    listener: The KnitListener showing the events.
+    rate: Deliveries per second, limited to MIN_RATE to MAX_RATE.
+  """
+
+  def __init__(self, listener, rate=DEFAULT_RATE):
+    self.__listener = listener
+    self.__interval = 1.0 / min(max(rate, MIN_RATE), MAX_RATE)
+
+    self.__condition = threading.Condition()
+    # serializes the calls of the listener
+    self.__deliverLock = threading.Lock()
+    self.__pending = {}
+    self.__running = False
+    self.__thread = None
+
+  def start(self):
+    """Starts the thread delivering the stored events."""
+    if self.__thread is not None:
+      return
+    self.__running = True
+    self.__thread = threading.Thread(target=self.__deliverLoop,
+                                     name="ProgressAggregator")
+    self.__thread.daemon = True
+    self.__thread.start()
+
+  def stop(self):
+    """Stops the thread, delivering the events stored last."""
+    with self.__condition:
+      self.__running = False
+      self.__condition.notify_all()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+    self.flush()
+
+  def flush(self):
+    """Delivers the stored events now."""
+    with self.__deliverLock:
+      self.__deliver()
+
+  def __deliver(self):
+    """Must be called holding the deliver lock."""
+    with self.__condition:
+      pending = self.__pending
+      self.__pending = {}
+    for event in _COALESCED:
+      if event in pending:
+        getattr(self.__listener, event)(*pending[event])
+
+  def __deliverLoop(self):
+    while True:
+      with self.__condition:
+        while self.__running and not self.__pending:
+          self.__condition.wait()
+        if not self.__running:
+          return
+      self.flush()
+      # rate limit, events stored meanwhile do not end the wait, stop() does
+      deadline = time.monotonic() + self.__interval
+      with self.__condition:
+        while self.__running:
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            break
+          self.__condition.wait(remaining)
+
+  def __store(self, event, *args):
+    with self.__condition:
+      self.__pending[event] = args
+      self.__condition.notify_all()
+
+  def __passOn(self, event, *args):
+    with self.__deliverLock:
+      self.__deliver()
+      getattr(self.__listener, event)(*args)
+
+  def updateColor(self, color):
+    self.__store("updateColor", color)
+
+  def updateProgress(self, row, total=0, repeats=0):
+    self.__store("updateProgress", row, total, repeats)
+
+  def updateStatus(self, hall_l, hall_r, carriage_type, carriage_position):
+    self.__store("updateStatus", hall_l, hall_r, carriage_type,
+                 carriage_position)
+
+  def playsound(self, event):
+    if event == "nextline":
+      self.__store("playsound", event)
+    else:
+      self.__passOn("playsound", event)
+
+  def updateNotification(self, message=""):
+    self.__passOn("updateNotification", message)
+
+  def notifyUser(self, message="", message_type="info"):
+    self.__passOn("notifyUser", message, message_type)
+
+  def waitForUserAction(self, message="", message_type="info"):
+    self.__passOn("waitForUserAction", message, message_type)
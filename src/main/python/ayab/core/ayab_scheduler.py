@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Hands out the lines of a pattern while knitting.
+
+Lines are worked out when they are requested instead of all at once before
+knitting starts. A background thread keeps a few lines ahead of the last
+request ready, so answering a line request never waits on computation.
+The lines ahead are also encoded as the cnfLine frames sent for them, so
+answering a request is a single write.
+"""
+
+import threading
+
+from .ayab_communication import LineFrame
+from .ayab_job import FLAG_LAST_LINE, FLAG_COLOR_SHIFT
+
+DEFAULT_LOOK_AHEAD = 32
+
+
+class LineScheduler(object):
+  """Streams the lines of an ayabImage on demand.
+
+  Any object with a lines() generator method yielding (color, bytes, imgRow)
+  tuples can be scheduled.
+  """
+
+  def __init__(self, image, infRepeat=False, lookAhead=DEFAULT_LOOK_AHEAD):
+    self.__image = image
+    self.__infRepeat = infRepeat
+    self.__lookAhead = lookAhead
+
+    self.__condition = threading.Condition()
+    # serializes the generation of lines, which happens outside condition
+    self.__generateLock = threading.Lock()
+    self.__thread = None
+    self.__running = False
+
+    self.__numLines = None
+    self.__restart()
+
+  def __restart(self):
+    """Starts generating lines from the beginning of the pattern."""
+    self.__lines = self.__image.lines()
+    self.__buffer = {}
+    self.__frames = {}
+    self.__generated = 0
+    self.__exhausted = False
+    self.__requested = 0
+
+  def __generateNext(self):
+    """Generates one more line. Must be called without holding the condition.
+
+    The line is worked out without holding the condition, so line() can
+    answer from the buffer meanwhile.
+    """
+    with self.__generateLock:
+      with self.__condition:
+        if self.__exhausted:
+          return
+        lines = self.__lines
+        lineNumber = self.__generated
+        previous = self.__buffer.get(lineNumber - 1)
+      try:
+        line = next(lines)
+      except StopIteration:
+        line = None
+      # now it is known if the previous line is the last one
+      frame = None
+      if previous is not None:
+        frame = self.__encode(previous, line is None)
+      with self.__condition:
+        if lines is not self.__lines:
+          # restarted while generating, the line belongs to the old run
+          return
+        if frame is not None:
+          self.__frames[lineNumber - 1] = frame
+        if line is None:
+          self.__exhausted = True
+          self.__numLines = self.__generated
+        else:
+          self.__buffer[lineNumber] = line
+          self.__generated += 1
+        self.__condition.notify_all()
+
+  def __encode(self, line, lastLine):
+    color, bytes, imgRow = line
+    flags = color << FLAG_COLOR_SHIFT
+    if lastLine and not self.__infRepeat:
+      flags |= FLAG_LAST_LINE
+    return LineFrame(bytes, flags, color, imgRow, lastLine)
+
+  def __generateUntil(self, lineNumber):
+    """Generates lines until lineNumber exists or the pattern ended."""
+    while True:
+      with self.__condition:
+        if self.__generated > lineNumber or self.__exhausted:
+          return
+      self.__generateNext()
+
+  def __wrap(self, lineNumber):
+    """Maps lineNumber into the pattern, None if it is past the end."""
+    if self.__numLines is None or lineNumber < self.__numLines:
+      return lineNumber
+    if not self.__infRepeat or self.__numLines == 0:
+      return None
+    return lineNumber % self.__numLines
+
+  def __dropBefore(self, lineNumber):
+    for oldLine in [n for n in self.__buffer if n < lineNumber]:
+      del self.__buffer[oldLine]
+      self.__frames.pop(oldLine, None)
+
+  def start(self):
+    """Starts the background thread filling the look-ahead buffer."""
+    if self.__thread is not None:
+      return
+    self.__running = True
+    self.__thread = threading.Thread(target=self.__lookAheadLoop,
+                                     name="LineScheduler")
+    self.__thread.daemon = True
+    self.__thread.start()
+
+  def stop(self):
+    """Stops the background thread."""
+    with self.__condition:
+      self.__running = False
+      self.__condition.notify_all()
+    if self.__thread is not None:
+      self.__thread.join()
+      self.__thread = None
+
+  def __lookAheadLoop(self):
+    while True:
+      with self.__condition:
+        while self.__running and (self.__exhausted or self.__generated >
+                                  self.__requested + self.__lookAhead):
+          self.__condition.wait()
+        if not self.__running:
+          return
+      self.__generateNext()
+
+  def numBuffered(self):
+    """Returns the number of lines generated and not dropped yet."""
+    with self.__condition:
+      return len(self.__buffer)
+
+  def numLines(self):
+    """Returns the number of lines of the pattern, None if not known yet."""
+    with self.__condition:
+      return self.__numLines
+
+  def line(self, lineNumber):
+    """Returns the line with the given number.
+
+    Returns:
+      tuple: (color, bytes, imgRow, lastLine), or None if lineNumber is past
+      the end of the pattern. When repeating infinitely, line numbers wrap
+      around the end of the pattern.
+    """
+    found = self.__find(lineNumber)
+    if found is None:
+      return None
+    line, frame = found
+    color, bytes, imgRow = line
+    return color, bytes, imgRow, frame.lastLine
+
+  def frame(self, lineNumber):
+    """Returns the LineFrame sending the line with the given number.
+
+    Returns:
+      LineFrame: The encoded line, or None if lineNumber is past the end of
+      the pattern. Line numbers wrap around as in line().
+    """
+    found = self.__find(lineNumber)
+    if found is None:
+      return None
+    return found[1]
+
+  def __find(self, lineNumber):
+    """Returns the line and its LineFrame, None past the end."""
+    with self.__condition:
+      lineNumber = self.__wrap(lineNumber)
+      if lineNumber is None:
+        return None
+
+      if lineNumber < self.__generated and lineNumber not in self.__buffer:
+        # the line has already been dropped from the buffer
+        self.__restart()
+    # one line more is needed to know if lineNumber is the last one, its
+    # frame is encoded when the next line is generated
+    self.__generateUntil(lineNumber + 1)
+
+    with self.__condition:
+      if lineNumber >= self.__generated:
+        # the pattern ended before lineNumber
+        return self.__find(lineNumber)
+
+      found = self.__buffer[lineNumber], self.__frames[lineNumber]
+      self.__requested = lineNumber
+      self.__dropBefore(lineNumber - self.__lookAhead)
+      self.__condition.notify_all()
+      return found
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Knitting sessions, independent of any user interface.
+
+A KnitSession runs the protocol with the controller: it requests the
+firmware information, waits for the machine to be initialized, starts
+knitting and answers line requests until the pattern is finished. Whatever
+happens is reported to a KnitListener, which the GUI forwards to its
+widgets and a terminal runner prints.
+"""
+
+import logging
+
+from .ayab_communication import CommunicationException
+from .ayab_messages import MessageDecoder, CnfInfo, CnfStart, IndState, \
+  ReqLine
+from .ayab_scheduler import LineScheduler
+
+API_VERSION = 0x05
+
+# seconds to wait for cnfInfo before requesting it again
+REQ_INFO_INTERVAL = 0.5
+
+COLOR_NAMES = "A", "B", "C", "D", "E", "F", "G", "H"
+
+# KnittingMode.SINGLEBED, both colors are knitted in every line
+SINGLEBED = 0
+
+
+class KnitListener(object):
+  """Receives the events of a KnitSession, ignoring all of them.
+
+  Subclasses override the events they are interested in. Events are
+  reported from the thread running the session.
+  """
+
+  def updateNotification(self, message=""):
+    """A short message about the state of the session."""
+
+  def notifyUser(self, message="", message_type="info"):
+    """A message the user should read."""
+
+  def waitForUserAction(self, message="", message_type="info"):
+    """A message the user has to confirm, may block until confirmed."""
+
+  def updateProgress(self, row, total=0, repeats=0):
+    """The image row of the line sent last."""
+
+  def updateColor(self, color):
+    """The name of the color to knit, empty if not relevant."""
+
+  def updateStatus(self, hall_l, hall_r, carriage_type, carriage_position):
+    """The state of the machine as reported by the controller."""
+
+  def playsound(self, event):
+    """A sound for "start", "nextline" or "finished"."""
+
+
+class KnitSession(object):
+  """Knits an image through an AyabCommunication with an opened port.
+
+  Args:
+    communication: The AyabCommunication to talk to the controller.
+    image: The ayabImage or KnitJob to knit.
+    options: The configuration dict, using inf_repeat, knitting_mode and
+      continuousReporting.
+    listener: The KnitListener receiving the events.
+  """
+
+  def __init__(self, communication, image, options, listener=None,
+               apiVersion=API_VERSION):
+    self.__logger = logging.getLogger(type(self).__name__)
+    self.__ayabCom = communication
+    self.__image = image
+    self.__options = options
+    self.__listener = listener or KnitListener()
+    self.__apiVersion = apiVersion
+
+    self.__knitting_mode = options["knitting_mode"]
+    self.__infRepeat = options["inf_repeat"]
+    self.__infRepeat_repeats = 0
+
+    self.__formerRequest = 0
+    self.__lineBlock = 0
+    self.__running = False
+
+    self.__decoder = MessageDecoder()
+    # messages which are handled in every state
+    self.__handlers = {CnfInfo.ID: self.__onCnfInfo,
+                       IndState.ID: self.__onIndState}
+
+  def cancel(self):
+    """Stops knitting, knit() returns without waiting for a message."""
+    self.__running = False
+    self.__ayabCom.interrupt()
+
+  def knit(self):
+    """Runs the session until the pattern is sent or knitting stops.
+
+    Returns:
+      bool: True if all lines were sent, False otherwise.
+    """
+    listener = self.__listener
+    curState = 's_init'
+    oldState = 'none'
+
+    self.__scheduler = LineScheduler(self.__image, self.__infRepeat)
+    self.__scheduler.start()
+    try:
+        self.__running = True
+        listener.updateNotification("Connecting to machine...")
+        self.__ayabCom.req_info()
+        while self.__running:
+            # TODO catch keyboard interrupts to abort knitting
+            # blocks until the controller answers, cnfInfo is requested
+            # again until it does
+            timeout = REQ_INFO_INTERVAL if curState == 's_init' else None
+            rcvMsg = self.__checkSerial(timeout)
+            if curState == 's_init':
+                if isinstance(rcvMsg, CnfInfo):
+                    if rcvMsg.api == self.__apiVersion:
+                        curState = 's_waitForInit'
+                        listener.updateNotification("Please init machine. (Set the carriage to mode KC-I or KC-II and move the carriage over the left turn mark).")
+                    else:
+                        listener.notifyUser("Wrong Arduino Firmware Version. "
+                                            + "Please check if you have flashed "
+                                            + "the latest version. ("
+                                            + str(rcvMsg.api) + "/"
+                                            + str(self.__apiVersion) + ")")
+                        self.__logger.error("wrong API version: " + str(rcvMsg.api)
+                                          + (" ,expected: ") + str(self.__apiVersion))
+                        return False
+                else:
+                    listener.updateNotification("Connecting to machine...")
+                    self.__ayabCom.req_info()
+
+            if curState == 's_waitForInit':
+                if isinstance(rcvMsg, IndState):
+                  if rcvMsg.ready == 1:
+                      curState = 's_start'
+                  else:
+                      self.__logger.debug("init failed")
+
+            if curState == 's_start':
+                if oldState != curState:
+                      self.__ayabCom.req_start(self.__image.knitStartNeedle(),
+                                               self.__image.knitStopNeedle(),
+                                               self.__options["continuousReporting"])
+
+                if isinstance(rcvMsg, CnfStart):
+                    if rcvMsg.success == 1:
+                        curState = 's_operate'
+                        listener.updateNotification("Please Knit")
+                        listener.playsound("start")
+                    else:
+                        listener.updateNotification()
+                        listener.waitForUserAction("Device not ready, configure and try again.")
+                        self.__logger.error("device not ready")
+                        return False
+
+            if curState == 's_operate':
+                if isinstance(rcvMsg, ReqLine):
+                    imageFinished = self.__cnfLine(rcvMsg.lineNumber)
+                    if imageFinished:
+                        curState = 's_finished'
+
+            if curState == 's_finished':
+                listener.updateNotification("Image transmission finished. " \
+                                            "Please knit until you hear the " \
+                                            "double beep sound.")
+                listener.playsound("finished")
+                return True
+
+            oldState = curState
+    except CommunicationException:
+        self.__logger.error("lost the connection to the controller")
+        listener.notifyUser("Lost the connection to the machine.", "error")
+        return False
+    finally:
+        self.__running = False
+        self.__scheduler.stop()
+        if self.__decoder.numUnknown():
+            self.__logger.warning("ignored " + str(self.__decoder.numUnknown())
+                                  + " unknown messages")
+    return False
+
+  def __checkSerial(self, timeout=None):
+        """Returns the next message of the controller, None if none came."""
+        msg = self.__ayabCom.receive(timeout)
+        if msg is None:
+            return None
+        message = self.__decoder.decode(msg)
+        if message is not None:
+            handler = self.__handlers.get(message.ID)
+            if handler is not None:
+                handler(message)
+        return message
+
+  def __onCnfInfo(self, info):
+        log = "API v" + str(info.api)
+        if info.api >= 5 and info.firmwareMajor is not None:
+            log += ", FW v" + str(info.firmwareMajor) + "." \
+                + str(info.firmwareMinor)
+        self.__logger.info(log)
+
+  def __onIndState(self, state):
+        self.__listener.updateStatus(state.hallLeft, state.hallRight,
+                                     state.carriageName(), state.position)
+
+  def __cnfLine(self, lineNumber):
+        imgHeight = self.__image.imgHeight()
+        lastLine = 0x00
+
+        if lineNumber < 256:
+            # TODO some better algorithm for block wrapping
+            # if the last requested line number was 255, wrap to next block of
+            # lines
+            if self.__formerRequest == 255 and lineNumber == 0:
+                self.__lineBlock += 1
+            # store requested line number for next request
+            self.__formerRequest = lineNumber
+            reqestedLine = lineNumber
+
+            # adjust lineNumber with current block
+            lineNumber = lineNumber \
+                + (self.__lineBlock * 256)
+
+            frame = self.__scheduler.frame(lineNumber)
+            if frame is None:
+                self.__logger.error("requested lineNumber past the end of the pattern")
+                return 1  # image finished
+
+            # send line to machine, encoded by the scheduler in advance
+            self.__ayabCom.cnf_line_frame(reqestedLine, frame)
+            color, imgRow, lastLine = frame.color, frame.imgRow, \
+                int(frame.lastLine)
+
+            # screen output
+            msg = str(self.__lineBlock) # Block
+            msg += ' ' + str(lineNumber) # Total Line Number
+            msg += ' reqLine: ' + str(reqestedLine)
+            msg += ' imgRow: ' + str(imgRow)
+            msg += ' color: ' +  COLOR_NAMES[color]
+            self.__logger.debug(msg)
+
+            if self.__knitting_mode == SINGLEBED:
+                self.__listener.updateColor("")
+            else:
+                self.__listener.updateColor(COLOR_NAMES[color])
+
+            #sending line progress to gui
+            self.__listener.updateProgress(imgRow+1,
+                                           imgHeight,
+                                           self.__infRepeat_repeats)
+            self.__listener.playsound("nextline")
+
+        else:
+            self.__logger.error("requested lineNumber out of range")
+
+        if lastLine:
+          if self.__infRepeat:
+              self.__infRepeat_repeats += 1
+              return 0  # keep knitting
+          else:
+              return 1  # image finished
+        else:
+            return 0  # keep knitting
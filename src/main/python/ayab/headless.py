@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Knits from the terminal, without the GUI.
+
+The runner drives a KnitSession directly and prints the progress to
+stdout. It never imports PyQt5, so it starts quickly on small computers
+next to the machine. Images are compiled like the GUI does, compiled jobs
+(see ayab_job) are knitted without loading the image conversion at all.
+
+Usage:
+  ayab-knit --port PORT [options] IMAGE_OR_JOB
+"""
+
+import argparse
+import logging
+import sys
+
+from ayab.batch_compile import addOptionArguments, optionsFromArguments
+from ayab.core.ayab_communication import AyabCommunication, \
+  CommunicationException
+from ayab.core.ayab_job import JOB_FILE_SUFFIX, JobFileError, \
+  readJob
+from ayab.core.ayab_session import KnitListener, KnitSession
+
+
+class TerminalKnitListener(KnitListener):
+  """Prints the events of a KnitSession."""
+
+  def __init__(self, out=sys.stdout, showStatus=False):
+    self.__out = out
+    self.__showStatus = showStatus
+    self.__color = ""
+
+  def __print(self, text):
+    self.__out.write(text + "\n")
+    self.__out.flush()
+
+  def updateNotification(self, message=""):
+    if message:
+      self.__print(message)
+
+  def notifyUser(self, message="", message_type="info"):
+    self.__print("{0}: {1}".format(message_type, message))
+
+  def waitForUserAction(self, message="", message_type="info"):
+    self.notifyUser(message, message_type)
+
+  def updateColor(self, color):
+    self.__color = color
+
+  def updateProgress(self, row, total=0, repeats=0):
+    text = "row {0}/{1}".format(row, total)
+    if self.__color:
+      text += " color " + self.__color
+    if repeats:
+      text += " ({0} repeats completed)".format(repeats)
+    self.__print(text)
+
+  def updateStatus(self, hall_l, hall_r, carriage_type, carriage_position):
+    if self.__showStatus:
+      self.__print("hall {0}/{1} {2} at {3}".format(
+        hall_l, hall_r, carriage_type or "no carriage", carriage_position))
+
+
+def loadPattern(path, options):
+  """Returns the job or compiled image to knit and its configuration."""
+  if path.endswith(JOB_FILE_SUFFIX):
+    job = readJob(path)
+    jobOptions = job.options()
+    jobOptions["continuousReporting"] = options["continuousReporting"]
+    return job, jobOptions
+
+  # only images need Pillow and the conversion
+  from PIL import Image
+  from ayab.core.ayab_image import compileImage
+  image = compileImage(Image.open(path).convert("RGBA"), options)
+  image.setStartLine(options["start_line"])
+  return image, options
+
+
+def parseArguments(argv):
+  parser = argparse.ArgumentParser(
+    prog="ayab-knit",
+    description="Knits an image or a compiled job without the GUI.")
+  parser.add_argument("pattern", help="image or " + JOB_FILE_SUFFIX + " file")
+  parser.add_argument("-p", "--port", required=True,
+                      help="serial port of the controller")
+  parser.add_argument("--continuous-reporting", action="store_true",
+                      help="print the state of the machine while knitting")
+  addOptionArguments(parser)
+  return parser.parse_args(argv)
+
+
+def main(argv=None, out=sys.stdout):
+  logging.basicConfig(level=logging.WARNING)
+  args = parseArguments(sys.argv[1:] if argv is None else argv)
+  options = optionsFromArguments(args)
+  options["continuousReporting"] = args.continuous_reporting
+
+  try:
+    pattern, options = loadPattern(args.pattern, options)
+  except (IOError, JobFileError, ValueError) as e:
+    out.write("could not load {0}: {1}\n".format(args.pattern, e))
+    return 1
+
+  communication = AyabCommunication()
+  try:
+    communication.open_serial(args.port)
+  except CommunicationException:
+    out.write("could not open serial port {0}\n".format(args.port))
+    return 1
+
+  session = KnitSession(communication, pattern, options,
+                        TerminalKnitListener(out, args.continuous_reporting))
+  try:
+    finished = session.knit()
+  except KeyboardInterrupt:
+    out.write("knitting cancelled\n")
+    return 130
+  finally:
+    communication.close_serial()
+  return 0 if finished else 1
+
+
+if __name__ == "__main__":
+  sys.exit(main())
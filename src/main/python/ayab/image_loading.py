@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Loads image files for the GUI, in two steps.
+
+open_image only reads the header of the file, so images too wide for the
+machine are rejected before they are decoded. For very large JPEG files it
+also returns a preview decoded at a fraction of the size, which is fast.
+load_image then decodes the whole image.
+"""
+
+import math
+
+from PIL import Image
+
+# larger JPEG images get a preview
+PREVIEW_PIXELS = 1024 * 1024
+
+
+class ImageLoadError(Exception):
+  pass
+
+
+def open_image(path, max_width=None, cancellation=None):
+  """Reads the size of an image and a preview of large JPEG images.
+
+  Returns:
+    tuple: the size of the image and an RGBA preview, or None
+  """
+  try:
+    with Image.open(path) as image:
+      width, height = image.size
+      if max_width is not None and width > max_width:
+        raise ImageLoadError(
+          "The image is {0} pixels wide, the machine only has {1} needles."
+          .format(width, max_width))
+      if cancellation is not None:
+        cancellation.check()
+      if image.format != "JPEG" or width * height <= PREVIEW_PIXELS:
+        return (width, height), None
+      # the decoder scales down by 1/2, 1/4 or 1/8 while decoding
+      factor = math.sqrt(width * height / float(PREVIEW_PIXELS))
+      image.draft("RGB", (int(math.ceil(width / factor)),
+                          int(math.ceil(height / factor))))
+      return (width, height), image.convert("RGBA")
+  except (IOError, SyntaxError, ValueError) as e:
+    raise ImageLoadError("Could not open {0}: {1}".format(path, e))
+
+
+def load_image(path, cancellation=None):
+  """Decodes the whole image, converted to RGBA."""
+  try:
+    with Image.open(path) as image:
+      if cancellation is not None:
+        cancellation.check()
+      return image.convert("RGBA")
+  except (IOError, SyntaxError, ValueError) as e:
+    raise ImageLoadError("Could not load {0}: {1}".format(path, e))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""The transforms of the image actions of the GUI.
+
+A transform takes the image and its horizontal and vertical repeats and
+returns new ones, without touching the GUI. This lets the GUI run them on
+a worker thread. A running transform can be cancelled through its
+Cancellation, it stops at the next check.
+"""
+
+import logging
+import threading
+
+from PIL import Image
+import PIL.ImageOps
+
+
+class TransformCancelled(Exception):
+  pass
+
+
+class Cancellation(object):
+  """Tells a running transform to stop."""
+
+  def __init__(self):
+    self.__event = threading.Event()
+
+  def cancel(self):
+    self.__event.set()
+
+  def cancelled(self):
+    return self.__event.is_set()
+
+  def check(self):
+    """Raises TransformCancelled if the transform was cancelled."""
+    if self.__event.is_set():
+      raise TransformCancelled()
+
+
+def transform(transform_type, image, repeat, args, cancellation=None):
+  """Executes an image transform specified by key and args.
+
+  Returns:
+    tuple: the transformed image and its repeats
+  """
+  cancellation = cancellation or Cancellation()
+  cancellation.check()
+  image, repeat = TRANSFORMS[transform_type](image, tuple(repeat), args,
+                                             cancellation)
+  cancellation.check()
+  return image, repeat
+
+
+def rotate_image(image, repeat, args, cancellation):
+  if not args:
+    logging.debug("image not altered on rotate_image.")
+    return image, repeat
+  logging.debug("rotating image")
+  if args[0] % 180 == 90:
+    # the rotated repeats are repeats of the rotated image
+    repeat = repeat[::-1]
+  elif args[0] % 180 != 0:
+    image = materialize_repeat(image, repeat, cancellation)
+    repeat = (1, 1)
+  cancellation.check()
+  return image.rotate(args[0], expand=1), repeat
+
+
+def invert_image(image, repeat, args, cancellation):
+  if image.mode == 'RGBA':
+    r, g, b, a = image.split()
+    image = Image.merge('RGB', (r, g, b))
+  cancellation.check()
+  return PIL.ImageOps.invert(image), repeat
+
+
+def mirror_image(image, repeat, args, cancellation):
+  return PIL.ImageOps.mirror(image), repeat
+
+
+def flip_image(image, repeat, args, cancellation):
+  return PIL.ImageOps.flip(image), repeat
+
+
+def repeat_image(image, repeat, args, cancellation):
+  """
+  Repeat image.
+  Repeat pHorizontal times horizontally, pVertical times vertically
+  Sturla Lange 2017-12-30
+
+  The image is kept once, the repeats are only counted and drawn and
+  knitted from it.
+  """
+  repeat = (repeat[0]*args[1], # pHorizontal
+            repeat[1]*args[0]) # pVertical
+  return image.convert('RGB'), repeat
+
+
+def materialize_repeat(image, repeat, cancellation=None):
+  '''Returns the image with its repeats pasted into one image.'''
+  horizontal, vertical = repeat
+  if (horizontal, vertical) == (1, 1):
+    return image
+  old_w, old_h = image.size
+  new_im = Image.new(image.mode, (old_w*horizontal, old_h*vertical))
+  for h in range(0, old_h*vertical, old_h):
+    if cancellation is not None:
+      cancellation.check()
+    for w in range(0, old_w*horizontal, old_w):
+      new_im.paste(image, (w,h))
+  return new_im
+
+
+TRANSFORMS = {
+  'invert': invert_image,
+  'repeat': repeat_image,
+  'mirror': mirror_image,
+  'flip': flip_image,
+  'rotate': rotate_image,
+}
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""Measures how long importing the AYAB modules takes.
+
+Every module is imported in a fresh interpreter, which also reports which
+heavy dependencies got loaded along with it.
+
+Usage:
+  python -m ayab.import_time [MODULE ...]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# modules whose import time is tracked
+MODULES = ("ayab.core.ayab_job",
+           "ayab.core.ayab_scheduler",
+           "ayab.core.ayab_session",
+           "ayab.core.ayab_communication",
+           "ayab.core.ayab_async",
+           "ayab.core.ayab_cache",
+           "ayab.core.ayab_image",
+           "ayab.batch_compile",
+           "ayab.headless")
+
+# dependencies which take long to import
+HEAVY_MODULES = ("PyQt5", "numpy", "PIL", "serial", "pprint")
+
+_SCRIPT = """\
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [m for m in {heavy!r} if m in sys.modules]]))
+"""
+
+
+def measure(module):
+  """Imports a module in a new interpreter.
+
+  Returns:
+    tuple: (seconds the import took, heavy modules loaded by it)
+  """
+  script = _SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+  # run next to the ayab package, whatever the working directory is
+  root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  output = subprocess.check_output([sys.executable, "-c", script], cwd=root)
+  seconds, loaded = json.loads(output.decode("utf-8"))
+  return seconds, loaded
+
+
+def main(argv=None, out=sys.stdout):
+  modules = (sys.argv[1:] if argv is None else argv) or MODULES
+  for module in modules:
+    seconds, loaded = measure(module)
+    out.write("{0:<32} {1:7.1f} ms  {2}\n".format(
+      module, seconds * 1000, " ".join(loaded)))
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
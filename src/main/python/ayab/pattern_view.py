@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2013 Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+"""The scene showing the pattern on the needle bed.
+
+The scene and its items are created once. Changing the needles, the
+alignment or the knitting progress only moves items, the pattern is only
+drawn again when the image itself changes.
+
+The pattern is drawn in tiles, which are only made for the part of the
+pattern in view. Zoomed out, the tiles are made from every second, fourth,
+... pixel, so a tile always holds about as many pixels as it covers on
+screen, however tall the pattern is.
+"""
+
+from collections import OrderedDict
+import logging
+import math
+
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets, sip
+
+# TODO move to generic configuration
+MACHINE_WIDTH = 200
+
+BAR_HEIGHT = 5.0
+LIMIT_BAR_WIDTH = 0.5
+
+# size of a tile on screen, in pixels
+TILE_SIZE = 128
+# tiles kept, 16 MiB of RGBA tiles
+TILE_CACHE_SIZE = 256
+# the coarsest tiles take every 2 ** MAX_LEVEL pixel
+MAX_LEVEL = 6
+
+
+# QImage formats of the PIL modes kept as they are
+_FORMATS = {
+  "L": QtGui.QImage.Format_Grayscale8,
+  "P": QtGui.QImage.Format_Indexed8,
+  "RGB": QtGui.QImage.Format_RGB888,
+  "RGBA": QtGui.QImage.Format_RGBA8888,
+}
+
+
+def qimageFromArray(pixels, mode, colorTable=None):
+  """Returns a QImage showing the pixels of an array, without copying them.
+
+  The rows may be spaced apart, as in a slice of a larger image, but the
+  pixels of a row must be next to each other. The QImage points into the
+  array, so the array must be kept while the QImage is used.
+
+  Args:
+    pixels: A uint8 array of rows of pixels in the given PIL mode.
+    mode: "L", "P", "RGB" or "RGBA".
+    colorTable: The ARGB colors of the palette of a "P" image.
+  """
+  height, width = pixels.shape[:2]
+  channels = pixels.shape[2] if pixels.ndim == 3 else 1
+  if pixels.strides[1] != channels:
+    raise ValueError("the pixels of a row are not contiguous")
+  image = QtGui.QImage(sip.voidptr(pixels.ctypes.data), width, height,
+                       pixels.strides[0], _FORMATS[mode])
+  if colorTable is not None:
+    image.setColorTable(colorTable)
+  return image
+
+
+def _colorTable(pil_image):
+  """Returns the palette of a "P" image as ARGB colors."""
+  palette = pil_image.getpalette()
+  colors = np.zeros((256, 4), np.uint32)
+  colors[:, 3] = 255
+  entries = np.asarray(palette, np.uint32).reshape(-1, 3)[:256]
+  colors[:len(entries), :3] = entries
+  if "transparency" in pil_image.info:
+    transparency = pil_image.info["transparency"]
+    if isinstance(transparency, bytes):
+      colors[:len(transparency), 3] = bytearray(transparency)
+    else:
+      colors[transparency, 3] = 0
+  argb = colors[:, 3] << 24 | colors[:, 0] << 16 | colors[:, 1] << 8 \
+    | colors[:, 2]
+  return [int(color) for color in argb]
+
+
+class PatternItem(QtWidgets.QGraphicsItem):
+  """An image repeated horizontally and vertically, drawn in tiles.
+
+  Tiles are made when they are painted first and kept in a least recently
+  used cache of TILE_CACHE_SIZE tiles.
+
+  The pixels are kept once, in the mode of the image, and are shown as
+  QImage without converting them. A full size tile within one repeat is a
+  view into these pixels, only the pixmap made from it is a copy.
+  """
+
+  def __init__(self, pil_image, repeat=(1, 1), parent=None):
+    super(PatternItem, self).__init__(parent)
+    # paint() gets the exposed part of the item
+    self.setFlag(QtWidgets.QGraphicsItem.ItemUsesExtendedStyleOption)
+    if pil_image.mode == "1":
+      pil_image = pil_image.convert("L")
+    elif pil_image.mode not in _FORMATS:
+      pil_image = pil_image.convert("RGBA")
+    self.__mode = pil_image.mode
+    self.__colorTable = None
+    if pil_image.mode == "P":
+      self.__colorTable = _colorTable(pil_image)
+    self.__pixels = np.asarray(pil_image)
+    self.__imageHeight, self.__imageWidth = self.__pixels.shape[:2]
+    self.__width = self.__imageWidth * repeat[0]
+    self.__height = self.__imageHeight * repeat[1]
+    self.__tiles = OrderedDict()
+
+  def boundingRect(self):
+    return QtCore.QRectF(0, 0, self.__width, self.__height)
+
+  def paint(self, painter, option, widget=None):
+    lod = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+      painter.worldTransform())
+    level = 0
+    if lod < 1:
+      level = min(int(math.floor(math.log(1.0 / lod, 2))), MAX_LEVEL)
+    # pixels of the pattern covered by a tile
+    span = TILE_SIZE << level
+
+    exposed = option.exposedRect.intersected(self.boundingRect())
+    if exposed.isEmpty():
+      return
+    left = int(exposed.left()) // span
+    right = int(math.ceil(exposed.right())) // span
+    top = int(exposed.top()) // span
+    bottom = int(math.ceil(exposed.bottom())) // span
+    for ty in range(top, bottom + 1):
+      for tx in range(left, right + 1):
+        x, y = tx * span, ty * span
+        if x >= self.__width or y >= self.__height:
+          continue
+        pixmap = self.__tile(level, tx, ty)
+        painter.drawPixmap(
+          QtCore.QRectF(x, y, min(span, self.__width - x),
+                        min(span, self.__height - y)),
+          pixmap, QtCore.QRectF(pixmap.rect()))
+
+  def __tile(self, level, tx, ty):
+    key = (level, tx, ty)
+    pixmap = self.__tiles.pop(key, None)
+    if pixmap is None:
+      pixels = self.__tilePixels(*key)
+      pixmap = QtGui.QPixmap.fromImage(
+        qimageFromArray(pixels, self.__mode, self.__colorTable))
+      if len(self.__tiles) >= TILE_CACHE_SIZE:
+        self.__tiles.popitem(last=False)
+    self.__tiles[key] = pixmap
+    return pixmap
+
+  def __tilePixels(self, level, tx, ty):
+    """Returns the pixels of a tile, every 2 ** level pixel."""
+    span = TILE_SIZE << level
+    step = 1 << level
+    x0, x1 = tx * span, min((tx + 1) * span, self.__width)
+    y0, y1 = ty * span, min((ty + 1) * span, self.__height)
+    # repeats wrap around the image
+    left, top = x0 % self.__imageWidth, y0 % self.__imageHeight
+    if step == 1 and left + x1 - x0 <= self.__imageWidth \
+        and top + y1 - y0 <= self.__imageHeight:
+      return self.__pixels[top:top + y1 - y0, left:left + x1 - x0]
+    xs = np.arange(x0, x1, step) % self.__imageWidth
+    ys = np.arange(y0, y1, step) % self.__imageHeight
+    return self.__pixels[np.ix_(ys, xs)]
+
+
+class PatternScene(QtWidgets.QGraphicsScene):
+  """Draws the machine, the needle limits, the pattern and the progress."""
+
+  def __init__(self, parent=None):
+    super(PatternScene, self).__init__(parent)
+    self.__width = 0
+    self.__height = 0
+    self.__startNeedle = 80
+    self.__stopNeedle = 119
+    self.__alignment = "center"
+    self.__progress = 0
+
+    # Draw "machine"
+    rect_orange = self.addRect(-(MACHINE_WIDTH/2.0), -BAR_HEIGHT,
+                               (MACHINE_WIDTH/2.0), BAR_HEIGHT)
+    rect_orange.setBrush(QtGui.QBrush(QtGui.QColor("orange")))
+    rect_green = self.addRect(0.0, -BAR_HEIGHT,
+                              (MACHINE_WIDTH/2.0), BAR_HEIGHT)
+    rect_green.setBrush(QtGui.QBrush(QtGui.QColor("green")))
+
+    self.__pattern = None
+
+    # limiting lines (start/stop needle) and knitting progress, placed by
+    # the __update methods
+    self.__startLimit = self.addRect(0, 0, 0, 0)
+    self.__stopLimit = self.addRect(0, 0, 0, 0)
+    self.__progressBar = self.addRect(0, 0, 0, 0)
+
+  def setImage(self, pil_image, repeat=(1, 1), size=None):
+    """Draws a new image, repeated horizontally and vertically.
+
+    A preview smaller than the image it shows is stretched to the size
+    of the image.
+    """
+    if self.__pattern is not None:
+      self.removeItem(self.__pattern)
+      self.__pattern = None
+    if pil_image is None:
+      self.__width, self.__height = 0, 0
+    else:
+      width, height = size or pil_image.size
+      self.__width = width * repeat[0]
+      self.__height = height * repeat[1]
+      self.__pattern = PatternItem(pil_image, repeat)
+      if size is not None:
+        self.__pattern.setTransform(QtGui.QTransform.fromScale(
+          width / float(pil_image.size[0]),
+          height / float(pil_image.size[1])))
+      self.addItem(self.__pattern)
+      # below the needle limits and the progress
+      self.__pattern.setZValue(-1)
+    self.__updatePattern()
+    self.__updateLimits()
+    self.__updateProgress()
+    self.__updateSceneRect()
+
+  def setNeedles(self, startNeedle, stopNeedle):
+    self.__startNeedle = startNeedle
+    self.__stopNeedle = stopNeedle
+    self.__updatePattern()
+    self.__updateLimits()
+    self.__updateSceneRect()
+
+  def setAlignment(self, alignment):
+    self.__alignment = alignment
+    self.__updatePattern()
+    self.__updateSceneRect()
+
+  def setProgress(self, row):
+    self.__progress = row
+    self.__updateProgress()
+
+  def __updateSceneRect(self):
+    # the scene would otherwise keep the size of the largest image shown
+    self.setSceneRect(self.itemsBoundingRect())
+
+  def __updatePattern(self):
+    """Moves the pattern according to the alignment."""
+    if self.__pattern is None:
+      return
+    if self.__alignment == 'left':
+      self.__pattern.setPos(self.__startNeedle - 100, 0)
+    elif self.__alignment == 'center':
+      self.__pattern.setPos(
+        -(self.__width/2.0)+((self.__startNeedle+self.__stopNeedle)/2) - 100,
+        0)
+    elif self.__alignment == 'right':
+      self.__pattern.setPos(self.__stopNeedle - 100 - self.__width, 0)
+    else:
+      logging.warning("invalid alignment")
+
+  def __updateLimits(self):
+    self.__startLimit.setRect(self.__startNeedle - 101, -BAR_HEIGHT,
+                              LIMIT_BAR_WIDTH,
+                              self.__height + 2*BAR_HEIGHT)
+    self.__stopLimit.setRect(self.__stopNeedle - 100, -BAR_HEIGHT,
+                             LIMIT_BAR_WIDTH,
+                             self.__height + 2*BAR_HEIGHT)
+
+  def __updateProgress(self):
+    self.__progressBar.setRect(-(MACHINE_WIDTH/2.0),
+                               self.__height - self.__progress,
+                               MACHINE_WIDTH, LIMIT_BAR_WIDTH)
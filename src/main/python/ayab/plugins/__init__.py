@@ -1,4 +1,4 @@
-# Add your module to file so PyInstaller can load dependencies.
-
-from . import ayab_plugin
-from . import dummy_knitting_plugin
+# Plugins are not imported here: they depend on PyQt5, which tools like the
+# headless runner and the batch compiler never load. The GUI imports the
+# plugin it uses itself. Plugins nothing imports have to be listed in the
+# hidden_imports of src/build/settings/base.json, so PyInstaller bundles them.
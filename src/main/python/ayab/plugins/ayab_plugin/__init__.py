@@ -1,4 +1,6 @@
-from . import ayab_control
-
-# This adds ayab_control.AyabControl to the upper namespace of the module.
-AyabPluginControl = ayab_control.AyabPluginControl
+# AyabPluginControl lives in ayab_control. It is not imported here, the GUI
+# imports it when it is needed:
+#
+#   from ayab.plugins.ayab_plugin.ayab_control import AyabPluginControl
+#
+# The modules knitting without the GUI are part of ayab.core.
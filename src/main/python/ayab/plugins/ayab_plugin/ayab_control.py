@@ -17,8 +17,13 @@
 #    Copyright 2013, 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
 #    https://github.com/AllYarnsAreBeautiful/ayab-desktop
 
-from .ayab_communication import AyabCommunication
-from . import ayab_image
+from ayab.core.ayab_communication import AyabCommunication
+from ayab.core import ayab_job
+from ayab.core.ayab_cache import PatternCache, DiskPatternCache, imageHash, \
+    patternKey, DEFAULT_CACHE_BYTES, DEFAULT_CACHE_DIR
+from ayab.core.ayab_session import KnitSession, KnitListener
+from ayab.core.ayab_progress import ProgressAggregator, \
+    DEFAULT_RATE as DEFAULT_PROGRESS_RATE
 import math
 import logging
 import os
@@ -30,8 +35,6 @@ from enum import Enum
 from .ayab_options import Ui_DockWidget
 import serial.tools.list_ports
 
-import pprint
-
 class KnittingMode(Enum):
     SINGLEBED = 0
     CLASSIC_RIBBER_1 = 1            # Classic Ribber 1
@@ -56,26 +59,20 @@ class AyabPluginControl(KnittingPlugin):
     #print ', '.join("%s: %s" % item for item in vars(e).items())
     #FIXME: substitute setting parent_ui from self.__parent_ui
     #self.__parent_ui = e.event.parent_ui
-    parent_ui = self.__parent_ui
+    job = getattr(e, "job", None)
+    if job is not None:
+        self.__configure_job(job, getattr(e, "options", {}))
+        return
 
-    #Start to knit with the bottom first
-    pil_image = parent_ui.pil_image.rotate(180)
+    parent_ui = self.__parent_ui
 
     conf = self.get_configuration_from_ui(parent_ui)
-    #TODO: detect if previous conf had the same image to avoid re-generating.
-
-    self.__image = ayab_image.ayabImage(pil_image, self.conf)
+    self.__image = self.__compile_image(parent_ui.pil_image, conf)
 
     if self.validate_configuration(conf):
         self.__emit_widget_knitcontrol_enabled(True)
         self.__emit_button_knit_enabled(True)
 
-        if conf.get("start_needle") and conf.get("stop_needle"):
-            self.__image.setKnitNeedles(conf.get("start_needle"),
-                                        conf.get("stop_needle"))
-        if conf.get("alignment"):
-            self.__image.setImagePosition(conf.get("alignment"))
-
         self.__image.setStartLine(conf.get("start_line"))
         self.__emit_progress(conf.get("start_line")+1, self.__image.imgHeight())
         self.__emit_color("")
@@ -85,6 +82,51 @@ class AyabPluginControl(KnittingPlugin):
 
     return
 
+  def __compile_image(self, pil_image, conf):
+    # reuse the pattern if the image and options did not change
+    key = patternKey(imageHash(pil_image), conf)
+    image = self.__patternCache.get(key)
+    if image is None and self.__diskPatternCache is not None:
+        image = self.__diskPatternCache.get(key, conf)
+        if image is not None:
+            self.__patternCache.put(key, image)
+    if image is not None:
+        self.__logger.debug("using cached pattern")
+        return image
+
+    # the conversion code is only loaded when an image gets compiled
+    from ayab.core.ayab_image import compileImage
+    image = compileImage(pil_image, conf)
+    self.__patternCache.put(key, image)
+    if self.__diskPatternCache is not None:
+        self.__diskPatternCache.put(key, image)
+    return image
+
+  def __configure_job(self, path, options):
+    """Configures knitting a compiled job file (see ayab_job).
+
+    Args:
+      path: The path of the .ayabjob file.
+      options: Options not held by the job, like portname and
+        continuousReporting.
+    """
+    try:
+        job = ayab_job.readJob(path)
+    except (IOError, ayab_job.JobFileError) as e:
+        self.__notify_user("Could not read job file: {0}".format(e), "warning")
+        self.__emit_widget_knitcontrol_enabled(False)
+        self.__emit_button_knit_enabled(False)
+        return
+
+    self.__image = job
+    self.conf = job.options()
+    self.conf["continuousReporting"] = False
+    self.conf.update(options)
+    self.__logger.debug(self.conf)
+    self.__emit_widget_knitcontrol_enabled(True)
+    self.__emit_button_knit_enabled(True)
+    self.__emit_progress(job.startLine()+1, job.imgHeight())
+
   def validate_configuration(self, conf):
     if conf.get("start_needle") and conf.get("stop_needle"):
       if conf.get("start_needle") > conf.get("stop_needle"):
@@ -117,7 +159,8 @@ class AyabPluginControl(KnittingPlugin):
 
   def cancel(self):
     self.__updateNotification("Knitting cancelled")
-    self._knitImage = False
+    if self.__session is not None:
+        self.__session.cancel()
 
   def __close_serial(self):
     self.__ayabCom.close_serial()
@@ -127,10 +170,6 @@ class AyabPluginControl(KnittingPlugin):
     self.__logger.error("Error while Knitting.")
     self.__close_serial()
 
-  def __wait_for_user_action(self, message="", message_type="info"):
-    """Sends the display_blocking_pop_up_signal QtSignal to main GUI thread, blocking it."""
-    self.__parent_ui.signalDisplayBlockingPopUp.emit(message, message_type)
-
   def __notify_user(self, message="", message_type="info"):
     """Sends the display_pop_up_signal QtSignal to main GUI thread, not blocking it."""
     self.__parent_ui.signalDisplayPopUp.emit(message, message_type)
@@ -149,11 +188,6 @@ class AyabPluginControl(KnittingPlugin):
     """Sends the updateProgress QtSignal."""
     self.__parent_ui.signalUpdateColor.emit(color)
 
-  def __emit_status(self, hall_l, hall_r, carriage_type, carriage_position):
-    """Sends the updateStatus QtSignal"""
-    self.__parent_ui.signalUpdateStatus.emit(hall_l, hall_r,
-                                             carriage_type, carriage_position)
-
   def __emit_button_knit_enabled(self, enabled):
     self.__parent_ui.signalUpdateButtonKnitEnabled.emit(enabled)
 
@@ -182,9 +216,6 @@ class AyabPluginControl(KnittingPlugin):
     alignment_text = self.options_ui.alignment_combo_box.currentText()
     self.__parent_ui.signalUpdateAlignment.emit(alignment_text)
 
-  def __emit_playsound(self, event):
-    self.__parent_ui.signalPlaysound.emit(event)
-
   def slotSetImageDimensions(self, width, height):
     """Called by Main UI on loading of an image to set Start/Stop needle
     to image width. Updates the maximum value of the Start Line UI element"""
@@ -332,6 +363,10 @@ class AyabPluginControl(KnittingPlugin):
     self.conf["inf_repeat"] = \
         int(ui.findChild(QtWidgets.QCheckBox, "infRepeat_checkbox").isChecked())
 
+    # horizontal and vertical repeats of the image, applied without
+    # repeating the image itself
+    self.conf["repeat"] = tuple(getattr(ui, "image_repeat", (1, 1)))
+
     knitting_mode_index = ui.findChild(QtWidgets.QComboBox, 
                                       "knitting_mode_box").currentIndex()
     self.conf["knitting_mode"] = knitting_mode_index
@@ -353,259 +388,73 @@ class AyabPluginControl(KnittingPlugin):
         """
         return list(serial.tools.list_ports.grep("USB"))
 
-  def __init__(self):
+  def __init__(self, patternCacheBytes=DEFAULT_CACHE_BYTES,
+               patternCacheDir=DEFAULT_CACHE_DIR,
+               progressRate=DEFAULT_PROGRESS_RATE):
     super(AyabPluginControl, self).__init__({})
     
     self.__logger = logging.getLogger(type(self).__name__)
 
-    #Copying from ayab_control
-    self.__API_VERSION = 0x05
-    self.__ayabCom = AyabCommunication()
+    self.__patternCache = PatternCache(patternCacheBytes)
+    # patterns are kept on disk as well unless patternCacheDir is None
+    self.__diskPatternCache = None
+    if patternCacheDir is not None:
+        self.__diskPatternCache = DiskPatternCache(patternCacheDir)
 
-    self.__formerRequest = 0
-    self.__lineBlock = 0
+    # knitting progress is shown progressRate times per second at most
+    self.__progressRate = progressRate
+
+    self.__ayabCom = AyabCommunication()
+    self.__session = None
 
   def __del__(self):
     self.__close_serial()
 
-###Copied from ayab_control
-#####################################
-
-  def __setBit(self, int_type, offset):
-      mask = 1 << int(offset)
-      return(int_type | mask)
-
-  def __setPixel(self, bytearray_, pixel):
-      numByte = int(pixel / 8)
-      bytearray_[numByte] = self.__setBit(int(bytearray_[numByte]), 
-                                          pixel - (8 * numByte))
-      return bytearray_
-
-  def __checkSerial(self):
-        msg = self.__ayabCom.update()
-
-        if msg == None:            
-            return("none", 0)
-
-        msgId = msg[0]
-        if msgId == 0xC1:    # cnfStart
-            # print "> cnfStart: " + str(ord(line[1]))
-            return ("cnfStart", msg[1])
-
-        elif msgId == 0xC3:  # cnfInfo
-            # print "> cnfInfo: Version=" + str(ord(line[1]))
-            api = msg[1]
-            log = "API v" + str(api)
-
-            if api >= 5:
-                log += ", FW v" + str(msg[2]) + "." + str(msg[3])
-
-            self.__logger.info(log)
-            return ("cnfInfo", msg[1])
-
-        elif msgId == 0x82:  # reqLine
-            # print "> reqLine: " + str(ord(line[1]))
-            return ("reqLine", msg[1])
-
-        elif msgId == 0xC4:  # cnfTest
-            return ("cnfTest", msg[1])
-
-        elif msgId == 0x84:
-            hall_l = int((msg[2] << 8) + msg[3])
-            hall_r = int((msg[4] << 8) + msg[5])
-
-            carriage_type = ""
-            if msg[6] == 1:
-                carriage_type = "K Carriage"
-            elif msg[6] == 2:
-                carriage_type = "L Carriage"
-            elif msg[6] == 3:
-                carriage_type = "G Carriage"
-
-            carriage_position = int(msg[7])
-
-            self.__emit_status(hall_l, hall_r,
-                               carriage_type, carriage_position)   
-
-            return ("indState", msg[1])
-
-        else:
-            self.__logger.debug("unknown message: ") # drop crlf
-            pp = pprint.PrettyPrinter(indent=4)
-            pp.pprint(msg)
-            return ("unknown", 0)
-            
-  def __cnfLine(self, lineNumber):
-        imgHeight = self.__image.imgHeight()
-        lenImgExpanded = len(self.__image.imageExpanded())
-        color = 0
-        indexToSend = 0
-        sendBlankLine = False
-        lastLine = 0x00
-
-        # TODO optimize performance
-        # initialize bytearray to 0x00
-        bytes = bytearray(25)
-        for x in range(0, 25):
-            bytes[x] = 0x00
-
-        if lineNumber < 256:
-            # TODO some better algorithm for block wrapping
-            # if the last requested line number was 255, wrap to next block of
-            # lines
-            if self.__formerRequest == 255 and lineNumber == 0:
-                self.__lineBlock += 1
-            # store requested line number for next request
-            self.__formerRequest = lineNumber
-            reqestedLine = lineNumber
-
-            # adjust lineNumber with current block
-            lineNumber = lineNumber \
-                + (self.__lineBlock * 256)
-
-
-            # TODO implement CRC8
-            crc8 = 0x00
-            colorRow, byteRow, imageRow = self.__image.pattern()
-            color = colorRow[lineNumber]
-            bytes = byteRow[lineNumber]
-            imgRow = imageRow[lineNumber]
-
-            if self.__infRepeat:
-                lineNumber = lineNumber % len(byteRow)
-
-            if(lineNumber == len(colorRow)-1):
-                lastLine = 0x01
-
-            # send line to machine
-            if self.__infRepeat:
-              flags = 0 | sendBlankLine << 1 | color << 3
-              self.__ayabCom.cnf_line(reqestedLine, bytes, flags, crc8)
-            else:
-              flags = lastLine | sendBlankLine << 1 | color << 3
-              self.__ayabCom.cnf_line(reqestedLine, bytes, flags, crc8)
-
-            # screen output
-            colorNames = "A", "B", "C", "D", "E", "F", "G", "H"
-            msg = str(self.__lineBlock) # Block
-            msg += ' ' + str(lineNumber) # Total Line Number
-            msg += ' reqLine: ' + str(reqestedLine)
-            msg += ' imgRow: ' + str(imgRow)
-            msg += ' color: ' +  colorNames[color]
-            if sendBlankLine == True:
-                msg += ' BLANK LINE'
-            else:
-                msg += ' indexToSend: ' + str(indexToSend)
-                msg += ' color: ' + str(color)
-                #msg += ' ' + str((self.__image.imageExpanded())[indexToSend])
-            self.__logger.debug(msg)
-
-            if self.__knitting_mode == KnittingMode.SINGLEBED.value:
-                self.__emit_color("")
-            elif sendBlankLine == True:
-                pass
-            else:
-                self.__emit_color(colorNames[color])
-
-            #sending line progress to gui
-            self.__emit_progress(imgRow+1,
-                                 imgHeight,
-                                 self.__infRepeat_repeats)
-            self.__emit_playsound("nextline")
-
-        else:
-            self.__logger.error("requested lineNumber out of range")
-
-        if lastLine:
-          if self.__infRepeat:
-              self.__infRepeat_repeats += 1
-              return 0  # keep knitting
-          else:
-              return 1  # image finished
-        else:
-            return 0  # keep knitting
-
   def __knitImage(self, pImage, pOptions):
-      self.__formerRequest = 0
-      self.__image = pImage
-      self.__startLine = pImage.startLine()
-
-      self.__numColors = pOptions["num_colors"]
-      self.__knitting_mode = pOptions["knitting_mode"]
-      self.__infRepeat = pOptions["inf_repeat"]
-      self.__infRepeat_repeats = 0
-
-      API_VERSION = self.__API_VERSION
-      curState = 's_init'
-      oldState = 'none'
-
       if not self.__ayabCom.open_serial(pOptions["portname"]):
           self.__logger.error("Could not open serial port")
           return
 
-      self._knitImage = True
-      while self._knitImage:
-          # TODO catch keyboard interrupts to abort knitting
-          # TODO: port to state machine or similar.
-          rcvMsg, rcvParam = self.__checkSerial()
-          if curState == 's_init':
-              if rcvMsg == 'cnfInfo':
-                  if rcvParam == API_VERSION:
-                      curState = 's_waitForInit'
-                      self.__updateNotification("Please init machine. (Set the carriage to mode KC-I or KC-II and move the carriage over the left turn mark).")
-                  else:
-                      self.__notify_user("Wrong Arduino Firmware Version. "
-                                         + "Please check if you have flashed "
-                                         + "the latest version. ("
-                                         + str(rcvParam) + "/"
-                                         + str(API_VERSION) + ")")
-                      self.__logger.error("wrong API version: " + str(rcvParam)
-                                        + (" ,expected: ") + str(API_VERSION))                                        
-                      return
-              else:
-                  self.__updateNotification("Connecting to machine...")                  
-                  self.__ayabCom.req_info()
-
-          if curState == 's_waitForInit':
-              if rcvMsg == "indState":
-                if rcvParam == 1:
-                    curState = 's_start'
-                else:
-                    self.__logger.debug("init failed")
-
-          if curState == 's_start':
-              if oldState != curState:
-                    self.__ayabCom.req_start(self.__image.knitStartNeedle(),
-                                             self.__image.knitStopNeedle(),
-                                             pOptions["continuousReporting"])
-
-              if rcvMsg == 'cnfStart':
-                  if rcvParam == 1:
-                      curState = 's_operate'
-                      self.__updateNotification("Please Knit")
-                      self.__emit_playsound("start")
-                  else:
-                      self.__updateNotification()
-                      self.__wait_for_user_action("Device not ready, configure and try again.")
-                      self.__logger.error("device not ready")
-                      return
-
-          if curState == 's_operate':
-              if rcvMsg == 'reqLine':
-                  imageFinished = self.__cnfLine(rcvParam)
-                  if imageFinished:
-                      curState = 's_finished'
-
-          if curState == 's_finished':
-              self.__updateNotification("Image transmission finished. " \
-                                        "Please knit until you hear the " \
-                                        "double beep sound.")
-              self.__emit_playsound("finished")
-              break
-
-
-          oldState = curState
+      listener = ProgressAggregator(_GuiKnitListener(self.__parent_ui),
+                                    self.__progressRate)
+      self.__session = KnitSession(self.__ayabCom, pImage, pOptions, listener)
+      listener.start()
+      try:
+          self.__session.knit()
+      finally:
+          self.__session = None
+          listener.stop()
 
       self.options_ui.label_carriage.setText("No carriage detected")
       self.options_ui.tabWidget.setCurrentIndex(0)
       return
+
+
+class _GuiKnitListener(KnitListener):
+  """Forwards the events of a KnitSession to the signals of the main UI."""
+
+  def __init__(self, parent_ui):
+    self.__parent_ui = parent_ui
+
+  def updateNotification(self, message=""):
+    self.__parent_ui.signalUpdateNotification.emit(message)
+
+  def notifyUser(self, message="", message_type="info"):
+    self.__parent_ui.signalDisplayPopUp.emit(message, message_type)
+
+  def waitForUserAction(self, message="", message_type="info"):
+    self.__parent_ui.signalDisplayBlockingPopUp.emit(message, message_type)
+
+  def updateProgress(self, row, total=0, repeats=0):
+    self.__parent_ui.signalUpdateProgress.emit(int(row), int(total),
+                                               int(repeats))
+
+  def updateColor(self, color):
+    self.__parent_ui.signalUpdateColor.emit(color)
+
+  def updateStatus(self, hall_l, hall_r, carriage_type, carriage_position):
+    self.__parent_ui.signalUpdateStatus.emit(hall_l, hall_r,
+                                             carriage_type, carriage_position)
+
+  def playsound(self, event):
+    self.__parent_ui.signalPlaysound.emit(event)
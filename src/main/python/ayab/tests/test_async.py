@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import asyncio
+import os
+import serial
+import sliplib
+import unittest
+from ayab.core.ayab_async import AsyncAyabCommunication
+from ayab.core.ayab_communication import CommunicationException
+
+# seconds to wait for a message that should arrive
+TIMEOUT = 2
+
+
+class TestAsyncCommunication(unittest.TestCase):
+
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+
+  def tearDown(self):
+    self.loop.close()
+
+  def run_until_complete(self, coroutine):
+    return self.loop.run_until_complete(
+      asyncio.wait_for(coroutine, TIMEOUT))
+
+  def test_loop_url(self):
+    com = AsyncAyabCommunication(serial.serial_for_url("loop://"))
+
+    async def talk():
+      await com.req_info()
+      await com.req_start(0, 10, 1)
+      await com.cnf_line(13, bytes([0xAB, 0xC0, 0xDB]), 0x12, 0x57)
+      messages = []
+      async for msg in com:
+        messages.append(msg)
+        if len(messages) == 3:
+          com.close_serial()
+      return messages
+
+    assert self.run_until_complete(talk()) == [
+      b'\x03', bytes([0x01, 0, 10, 1]),
+      bytes([0x42, 13, 0xAB, 0xC0, 0xDB, 0x12, 0x57])]
+    with self.assertRaises(CommunicationException):
+      self.run_until_complete(com.receive())
+
+  def test_several_ports(self):
+    coms = [AsyncAyabCommunication(serial.serial_for_url("loop://"))
+            for i in range(3)]
+
+    async def talk(com, lineNumber):
+      await com.cnf_line(lineNumber, b'\x00', 0, 0)
+      return await com.receive()
+
+    async def talkAll():
+      return await asyncio.gather(*[talk(com, i)
+                                    for i, com in enumerate(coms)])
+
+    messages = self.run_until_complete(talkAll())
+    assert [msg[1] for msg in messages] == [0, 1, 2]
+    for com in coms:
+      com.close_serial()
+
+  @unittest.skipUnless(hasattr(os, "openpty"), "needs a pseudo terminal")
+  def test_file_descriptor(self):
+    master, slave = os.openpty()
+    try:
+      com = AsyncAyabCommunication(serial.Serial(os.ttyname(slave), 115200))
+      com.open_serial("unused")
+
+      async def talk():
+        frames = sliplib.encode(bytes([0xC3, 5, 0, 1])) \
+          + sliplib.encode(bytes([0x82, 0xC0]))
+        # a frame split across reads
+        os.write(master, frames[:3])
+        first = asyncio.ensure_future(com.receive())
+        await asyncio.sleep(0.01)
+        os.write(master, frames[3:])
+        messages = [await first, await com.receive()]
+        await com.req_info()
+        return messages
+
+      assert self.run_until_complete(talk()) == [
+        bytes([0xC3, 5, 0, 1]), bytes([0x82, 0xC0])]
+      assert os.read(master, 100) == sliplib.encode(b'\x03')
+      com.close_serial()
+    finally:
+      os.close(master)
+      os.close(slave)
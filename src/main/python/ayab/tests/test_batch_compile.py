@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from ayab import batch_compile
+from ayab.core.ayab_image import compileImage
+from ayab.core.ayab_job import encodeJob
+
+
+class TestBatchCompile(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    for i in range(3):
+      pixels = np.random.RandomState(i).randint(0, 256, (10 + i, 30))
+      Image.fromarray(pixels.astype(np.uint8), 'L') \
+        .save(os.path.join(self.directory, "pattern{0}.png".format(i)))
+    with open(os.path.join(self.directory, "notes.txt"), "w") as f:
+      f.write("not an image")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_compile_directory(self):
+    options = dict(batch_compile.DEFAULT_OPTIONS, num_colors=3,
+                   knitting_mode=1, start_line=2)
+    config = os.path.join(self.directory, "config.json")
+    with open(config, "w") as f:
+      json.dump(options, f)
+    output = os.path.join(self.directory, "jobs")
+
+    assert batch_compile.main([self.directory, "-c", config, "-o", output,
+                               "-j", "2", "--stop-needle", "139"]) == 0
+    options["stop_needle"] = 139
+    assert sorted(os.listdir(output)) == ["pattern0.ayabjob",
+                                          "pattern1.ayabjob",
+                                          "pattern2.ayabjob"]
+    for i in range(3):
+      pil_image = Image.open(os.path.join(self.directory,
+                                          "pattern{0}.png".format(i)))
+      image = compileImage(pil_image.convert("RGBA"), options)
+      image.setStartLine(2)
+      with open(os.path.join(output, "pattern{0}.ayabjob".format(i)),
+                "rb") as f:
+        assert f.read() == encodeJob(image)
+
+  def test_report(self):
+    out = io.StringIO()
+    failed = batch_compile.compileDirectory(self.directory,
+                                            batch_compile.DEFAULT_OPTIONS,
+                                            processes=1, out=out)
+    report = out.getvalue().splitlines()
+    assert failed == 0
+    assert report[0].startswith("pattern0.png: 20 lines in ")
+    assert report[-1].startswith("compiled 3 of 3 images in ")
+
+  def test_compile_without_qt(self):
+    script = ("import sys\n"
+              "from ayab import batch_compile\n"
+              "assert batch_compile.compileDirectory(sys.argv[1],\n"
+              "  batch_compile.DEFAULT_OPTIONS, processes=1) == 0\n"
+              "assert 'PyQt5' not in sys.modules\n")
+    subprocess.check_call([sys.executable, "-c", script, self.directory],
+                          cwd=os.path.dirname(os.path.dirname(
+                            os.path.dirname(os.path.abspath(__file__)))))
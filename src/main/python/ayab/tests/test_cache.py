@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from mock import patch
+from PIL import Image
+from ayab.core.ayab_cache import PatternCache, \
+  DiskPatternCache, imageHash, patternKey
+from ayab.core.ayab_image import ayabImage
+
+
+class Pattern(object):
+
+  def __init__(self, nbytes):
+    self.__nbytes = nbytes
+
+  def nbytes(self):
+    return self.__nbytes
+
+
+class TestPatternCache(unittest.TestCase):
+
+  def setUp(self):
+    self.options = {"num_colors": 2, "knitting_mode": 0, "inf_repeat": 0,
+                    "start_needle": 80, "stop_needle": 119,
+                    "alignment": "center", "start_line": 0}
+
+  def test_key(self):
+    image = Image.new('L', (10, 5), 128)
+    key = patternKey(imageHash(image), self.options)
+    assert key == patternKey(imageHash(image.copy()), dict(self.options))
+    image.putpixel((3, 2), 0)
+    assert key != patternKey(imageHash(image), self.options)
+
+    options = dict(self.options, start_line=4)
+    assert key[1:] == patternKey(imageHash(image), options)[1:]
+    options = dict(self.options, alignment="left")
+    assert key[1:] != patternKey(imageHash(image), options)[1:]
+
+  def test_least_recently_used(self):
+    cache = PatternCache(maxBytes=100)
+    first, second, third = Pattern(40), Pattern(40), Pattern(40)
+    cache.put("first", first)
+    cache.put("second", second)
+    assert cache.get("first") is first
+    cache.put("third", third)
+    assert cache.get("second") is None
+    assert cache.get("first") is first
+    assert cache.get("third") is third
+    assert cache.size() == 80
+
+    cache.put("huge", Pattern(101))
+    assert "huge" not in cache
+    cache.setMaxBytes(50)
+    assert len(cache) == 1 and "third" in cache
+
+  def test_cache_image(self):
+    image = ayabImage(Image.new('L', (10, 5), 128), self.options)
+    cache = PatternCache()
+    cache.put("image", image)
+    assert cache.size() == image.nbytes() > 50
+    # both copies of the pixels and the schedule are counted
+    assert image.nbytes() == 2 * 10 * 5 + image.patternStore().nbytes() \
+      + image.schedule().nbytes()
+
+
+class TestDiskPatternCache(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    pixels = np.random.RandomState(3).randint(0, 256, (30, 45))
+    pixels[5:12] = 255
+    self.pil_image = Image.fromarray(pixels.astype(np.uint8), 'L')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def compile(self, options):
+    image = ayabImage(self.pil_image, options)
+    image.setKnitNeedles(options["start_needle"], options["stop_needle"])
+    image.setImagePosition(options["alignment"])
+    return image
+
+  def test_pattern_matches_live_image(self):
+    cache = DiskPatternCache(self.directory)
+    for knitting_mode, num_colors, alignment in [(0, 2, "center"),
+                                                 (1, 2, "left"),
+                                                 (1, 3, "right"),
+                                                 (2, 4, "center"),
+                                                 (3, 3, "30")]:
+      options = {"num_colors": num_colors, "knitting_mode": knitting_mode,
+                 "inf_repeat": 0, "start_needle": 60, "stop_needle": 139,
+                 "alignment": alignment}
+      key = patternKey(imageHash(self.pil_image), options)
+      assert cache.get(key, options) is None
+      image = self.compile(options)
+      cache.put(key, image)
+
+      cached = cache.get(key, options)
+      assert cached is not None and cached is not image
+      assert cached.imgStartNeedle() == image.imgStartNeedle()
+      assert cached.imageColors().tolist() == image.imageColors().tolist()
+      colorRow, byteRow, imageRow = cached.pattern()
+      expected = image.pattern()
+      assert colorRow == expected[0] and imageRow == expected[2]
+      assert [bytes(b) for b in byteRow] == [bytes(b) for b in expected[1]]
+      cached.setStartLine(3)
+      image.setStartLine(3)
+      assert cached.pattern()[2] == image.pattern()[2]
+
+  def test_read_only_directory(self):
+    options = {"num_colors": 2, "knitting_mode": 0, "inf_repeat": 0,
+               "start_needle": 0, "stop_needle": 199, "alignment": "left"}
+    cache = DiskPatternCache(self.directory)
+    cache.put("pattern", self.compile(options))
+    with patch.object(os, "utime", side_effect=OSError("read-only")):
+      assert cache.get("pattern", options) is not None
+
+  def test_evict(self):
+    options = {"num_colors": 2, "knitting_mode": 0, "inf_repeat": 0,
+               "start_needle": 0, "stop_needle": 199, "alignment": "left"}
+    image = self.compile(options)
+    cache = DiskPatternCache(self.directory, maxBytes=1024 * 1024)
+    cache.put("old", image)
+    cache.put("new", image)
+    size = os.path.getsize(cache.path("old"))
+
+    past = time.time() - 60
+    os.utime(cache.path("old"), (past, past))
+    cache = DiskPatternCache(self.directory, maxBytes=size)
+    cache.evict()
+    assert not os.path.exists(cache.path("old"))
+    assert os.path.exists(cache.path("new"))
+
+    cache = DiskPatternCache(self.directory, maxAge=0)
+    os.utime(cache.path("new"), (past, past))
+    cache.evict()
+    assert os.listdir(self.directory) == []
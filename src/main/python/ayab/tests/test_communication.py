@@ -17,33 +17,49 @@
 #    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
 #    https://github.com/AllYarnsAreBeautiful/ayab-desktop
 
+import threading
+import time
 import pytest
 import serial
+import sliplib
 import unittest
-from ayab.plugins.ayab_plugin.ayab_communication import AyabCommunication
+from ayab.core.ayab_communication import AyabCommunication, \
+  CommunicationException, LineFrame, cnfLineFrame, computeCrc8, checkCrc8
 from mock import patch
 
+# seconds to wait for a message that should arrive
+TIMEOUT = 2
+
 
 class TestCommunication(unittest.TestCase):
+  """Runs against loop://, which reads back what is written."""
 
   def setUp(self):
-    self.dummy_serial = serial.serial_for_url("loop://logging=debug")
+    self.dummy_serial = serial.serial_for_url("loop://")
     self.comm_dummy = AyabCommunication(self.dummy_serial)
 
+  def tearDown(self):
+    self.comm_dummy.close_serial()
+
   def test_close_serial(self):
       before = self.dummy_serial.isOpen()
       assert before
       self.comm_dummy.close_serial()
       after = self.dummy_serial.isOpen()
       assert after == False
+      with pytest.raises(CommunicationException):
+        self.comm_dummy.receive(TIMEOUT)
 
   def test_open_serial(self):
     with patch.object(serial,'Serial') as mock_method:
-      mock_method.return_value = object()
+      mock_method.return_value = serial.serial_for_url("loop://")
       self.ayabCom = AyabCommunication()
       openStatus = self.ayabCom.open_serial('dummyPortname')
       assert openStatus
       mock_method.assert_called_once_with('dummyPortname',115200)
+      self.ayabCom.req_info()
+      assert self.ayabCom.receive(TIMEOUT) == b'\x03'
+      self.ayabCom.close_serial()
 
     with patch.object(serial,'Serial') as mock_method:
       with pytest.raises(Exception) as excinfo:
@@ -55,32 +71,64 @@ class TestCommunication(unittest.TestCase):
 
   def test_req_start(self):
     start_val, end_val = 0, 10
-    self.comm_dummy.req_start(start_val, end_val)
-    byte_array = bytearray([0x01, start_val, end_val, 0x0a, 0x0d])
-    bytes_read = self.dummy_serial.read(len(byte_array))
-    self.assertEqual(bytes_read, byte_array)
+    self.comm_dummy.req_start(start_val, end_val, 1)
+    msg = self.comm_dummy.receive(TIMEOUT)
+    assert msg == bytes([0x01, start_val, end_val, 1])
 
   def test_req_info(self):
     self.comm_dummy.req_info()
-    byte_array = bytearray([0x03, 0x0a, 0x0d])
-    bytes_read = self.dummy_serial.read(len(byte_array))
-    assert bytes_read == byte_array
+    assert self.comm_dummy.receive(TIMEOUT) == b'\x03'
 
   def test_cnf_line(self):
     lineNumber = 13
-    lineData   = chr(0xAB)
+    lineData   = bytes([0xAB, 0xC0, 0xDB])
     flags      = 0x12
     crc8       = 0x57
     self.comm_dummy.cnf_line(lineNumber, lineData, flags, crc8)
-    byte_array = bytearray([0x42, lineNumber, lineData, flags, crc8, 0x0a, 0x0d])
-    bytes_read = self.dummy_serial.read(len(byte_array))
-    assert bytes_read == byte_array
-
-  def test_read_line(self):
-    byte_start_val = 0x01
-    byte_end_val = 0x12
-    byte_array = bytearray([0xC1, byte_start_val, byte_end_val, 0x0a, 0x0d])
-    bytes_wrote = self.dummy_serial.write(byte_array)
-    bytes_read = self.comm_dummy.read_line()
-    assert bytes_read == byte_array
+    msg = self.comm_dummy.receive(TIMEOUT)
+    assert msg == bytes([0x42, lineNumber]) + lineData + bytes([flags, crc8])
+
+  def test_cnf_line_frame(self):
+    lineData = bytes([0xAB, 0xC0, 0xDB])
+    lineFrame = LineFrame(lineData, 0x12)
+    for lineNumber in (13, 0xC0, 0xDB, 0):
+      self.comm_dummy.cnf_line_frame(lineNumber, lineFrame)
+      msg = self.comm_dummy.receive(TIMEOUT)
+      assert msg[:-1] == bytes([0x42, lineNumber]) + lineData + b'\x12'
+      assert checkCrc8(msg)
+
+  def test_crc8(self):
+    assert computeCrc8(b'123456789') == 0xA1
+    lineData = bytes(range(0, 250, 10))
+    lineFrame = LineFrame(lineData, 0x09)
+    for lineNumber in range(256):
+      frame = lineFrame.frame(lineNumber)
+      assert frame == cnfLineFrame(lineNumber, lineData, 0x09)
+      msg = sliplib.decode(bytes(frame))
+      assert msg[-1] == computeCrc8(msg[:-1])
+      assert checkCrc8(msg)
+      assert not checkCrc8(msg[:-1] + bytes([msg[-1] ^ 0x01]))
+
+  def test_receive_split_frames(self):
+    data = sliplib.Driver().send(bytes([0xC1, 0x01])) \
+      + sliplib.Driver().send(bytes([0x82, 0xC0]))
+    for i in range(len(data)):
+      self.dummy_serial.write(data[i:i + 1])
+    assert self.comm_dummy.receive(TIMEOUT) == bytes([0xC1, 0x01])
+    assert self.comm_dummy.receive(TIMEOUT) == bytes([0x82, 0xC0])
+
+  def test_receive_timeout(self):
+    start = time.time()
+    assert self.comm_dummy.receive(0.05) is None
+    assert time.time() - start < TIMEOUT
 
+  def test_interrupt(self):
+    received = []
+    thread = threading.Thread(
+      target=lambda: received.append(self.comm_dummy.receive()))
+    thread.start()
+    time.sleep(0.05)
+    self.comm_dummy.interrupt()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive()
+    assert received == [None]
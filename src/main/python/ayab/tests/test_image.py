@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import unittest
+import numpy as np
+from PIL import Image
+from ayab.core.ayab_image import ayabImage
+from ayab.core.ayab_planner import KnittingMode
+from ayab.core.ayab_pattern import PatternStore, needleMask, \
+  shiftRows
+
+
+def distill(pil_image, num_colors):
+  """Per pixel reference of the color distillation."""
+  clr_range = float(256)/num_colors
+  width, height = pil_image.size
+  intern = [[0 for i in range(width)] for j in range(height)]
+  colors = [[0 for i in range(num_colors)] for j in range(height)]
+  expanded = [[0 for i in range(width)] for j in range(num_colors*height)]
+  for row in range(0, height):
+    for col in range(0, width):
+      pxl = pil_image.getpixel((col, row))
+      for color in range(0, num_colors):
+        if pxl >= int(color*clr_range) and pxl < int((color+1)*clr_range):
+          intern[row][col] = color
+          colors[row][color] += 1
+          expanded[(num_colors*row)+color][col] = 1
+  return intern, colors, expanded
+
+
+def gradient_image(width, height):
+  pixels = np.arange(width*height, dtype=np.uint32).reshape(height, width)
+  pixels = (pixels * 37) % 256
+  return Image.fromarray(pixels.astype(np.uint8), 'L')
+
+
+class TestImage(unittest.TestCase):
+
+  def setUp(self):
+    self.pil_image = gradient_image(23, 11)
+
+  def options(self, num_colors, knitting_mode=KnittingMode.SINGLEBED.value):
+    return {"num_colors": num_colors,
+            "knitting_mode": knitting_mode,
+            "inf_repeat": 0}
+
+  def test_distill_colors(self):
+    for num_colors in range(2, 7):
+      image = ayabImage(self.pil_image, self.options(num_colors, 1))
+      intern, colors, expanded = distill(self.pil_image, num_colors)
+      assert np.asarray(image.imageIntern()).tolist() == intern
+      assert np.asarray(image.imageExpanded()).tolist() == expanded
+      assert np.asarray(image.imageColors()).tolist() == colors
+
+  def test_set_num_colors(self):
+    image = ayabImage(self.pil_image, self.options(2, 1))
+    image.setNumColors(4)
+    intern, colors, expanded = distill(self.pil_image, 4)
+    assert image.numColors() == 4
+    assert np.asarray(image.imageExpanded()).tolist() == expanded
+
+  def test_pattern_singlebed(self):
+    image = ayabImage(self.pil_image, self.options(2))
+    image.setKnitNeedles(0, 199)
+    image.setImagePosition('left')
+    colorRow, byteRow, imageRow = image.pattern()
+    intern, colors, expanded = distill(self.pil_image, 2)
+    assert len(byteRow) == 2 * self.pil_image.size[1]
+    for line, bytes_ in enumerate(byteRow):
+      row = imageRow[line]
+      assert colorRow[line] == 0
+      needles = [(bytes_[n // 8] >> (n % 8)) & 1 for n in range(23)]
+      assert needles == expanded[row * 2]
+
+  def test_pattern_store(self):
+    colorMap = np.array([[0, 1, 1, 0, 1, 1, 1, 1, 0, 1],
+                         [1, 1, 0, 0, 0, 0, 0, 0, 0, 1]], dtype=np.uint8)
+    store = PatternStore(colorMap, 2)
+    assert store.planes().shape == (4, 2)
+    assert store.colorCounts().tolist() == [[3, 7], [7, 3]]
+    assert store.colorMap().tolist() == colorMap.tolist()
+    assert store.expanded()[1].tolist() == colorMap[0].tolist()
+
+    store.placeOnNeedles(-1.5)
+    assert store.needleRows().shape == (4, 25)
+    row = store.needleRow(3)
+    assert bytes(row[:2]) == b'\x80\x00'
+    assert not row.flags.writeable
+    store.placeOnNeedles(196)
+    assert bytes(store.needleRow(1)[24:]) == b'\x60'
+
+  def test_shift_rows(self):
+    rows = np.array([[0b10000001, 0b1]], dtype=np.uint8)
+    assert shiftRows(rows, 3, 3).tolist() == [[0b1000, 0b1100, 0]]
+    assert shiftRows(rows, -1, 3).tolist() == [[0b11000000, 0, 0]]
+    assert shiftRows(rows, 16, 3).tolist() == [[0, 0, 0b10000001]]
+
+  def test_needle_mask(self):
+    mask = needleMask(3, 195)
+    assert mask is needleMask(3, 195)
+    assert not mask.flags.writeable
+    assert bytes(mask[:2]) == b'\x07\x00' and bytes(mask[24:]) == b'\xf0'
+    assert bytes(needleMask(0, 199)) == bytes(25)
+
+  def test_setters_rebuild_changed_stages(self):
+    image = ayabImage(self.pil_image, self.options(2, 1))
+    store = image.patternStore()
+    image.setKnitNeedles(50, 150)
+    image.setImagePosition('left')
+    assert image.patternStore() is store
+    assert store.needleOffset() == 50
+
+    image.setNumColors(3)
+    assert image.patternStore() is not store
+    intern, colors, expanded = distill(self.pil_image, 3)
+    assert np.asarray(image.imageExpanded()).tolist() == expanded
+    assert image.patternStore().needleOffset() == 50
+
+  def test_invert_image(self):
+    image = ayabImage(self.pil_image, self.options(3, 1))
+    image.invertImage()
+    inverted = Image.eval(self.pil_image, lambda pxl: 255 - pxl)
+    intern, colors, expanded = distill(inverted, 3)
+    assert np.asarray(image.imageIntern()).tolist() == intern
+
+  def test_repeat_image(self):
+    image = ayabImage(self.pil_image, self.options(2, 1))
+    image.repeatImage(3, 2)
+    assert (image.imgWidth(), image.imgHeight()) == (69, 22)
+    repeated = Image.new('L', (69, 22))
+    for y in range(0, 22, 11):
+      for x in range(0, 69, 23):
+        repeated.paste(self.pil_image, (x, y))
+    intern, colors, expanded = distill(repeated, 2)
+    assert np.asarray(image.imageIntern()).tolist() == intern
+
+  def test_resize_image(self):
+    image = ayabImage(self.pil_image, self.options(2, 1))
+    image.resizeImage(46)
+    assert (image.imgWidth(), image.imgHeight()) == (46, 22)
+
+  def test_repeat_is_not_materialized(self):
+    repeated = Image.new('L', (69, 22))
+    for y in range(0, 22, 11):
+      for x in range(0, 69, 23):
+        repeated.paste(self.pil_image, (x, y))
+
+    for knitting_mode, num_colors in [(0, 2), (1, 2), (1, 3), (2, 3), (3, 4)]:
+      image = ayabImage(self.pil_image, self.options(num_colors, knitting_mode))
+      image.repeatImage(3, 2)
+      reference = ayabImage(repeated, self.options(num_colors, knitting_mode))
+      for pattern in (image, reference):
+        pattern.setKnitNeedles(40, 160)
+        pattern.setImagePosition('center')
+        pattern.setStartLine(5)
+
+      assert image.patternStore().height() == 11
+      assert image.imgStartNeedle() == reference.imgStartNeedle()
+      colorRow, byteRow, imageRow = image.pattern()
+      expected = reference.pattern()
+      assert colorRow == expected[0] and imageRow == expected[2]
+      assert [bytes(b) for b in byteRow] == [bytes(b) for b in expected[1]]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from ayab import image_loading
+from ayab.image_loading import open_image, load_image, ImageLoadError
+
+
+class TestImageLoading(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def save(self, name, size, mode="RGB"):
+    path = os.path.join(self.directory, name)
+    pixels = np.random.RandomState(1).randint(0, 256, size[::-1] + (3,))
+    Image.fromarray(pixels.astype(np.uint8)).convert(mode).save(path)
+    return path
+
+  def test_open_and_load(self):
+    path = self.save("pattern.png", (40, 30), "L")
+    assert open_image(path, 200) == ((40, 30), None)
+    image = load_image(path)
+    assert image.mode == "RGBA" and image.size == (40, 30)
+
+  def test_too_wide(self):
+    path = self.save("wide.png", (201, 3))
+    with self.assertRaises(ImageLoadError):
+      open_image(path, 200)
+    assert open_image(path) == ((201, 3), None)
+
+  def test_jpeg_preview(self):
+    path = self.save("tall.jpg", (100, 400))
+    old = image_loading.PREVIEW_PIXELS
+    image_loading.PREVIEW_PIXELS = 2500
+    try:
+      size, preview = open_image(path, 200)
+    finally:
+      image_loading.PREVIEW_PIXELS = old
+    assert size == (100, 400)
+    assert preview.mode == "RGBA" and preview.size == (25, 100)
+    assert load_image(path).size == (100, 400)
+
+  def test_broken_file(self):
+    path = os.path.join(self.directory, "broken.png")
+    with open(path, "wb") as f:
+      f.write(b"not an image")
+    with self.assertRaises(ImageLoadError):
+      open_image(path)
+    with self.assertRaises(ImageLoadError):
+      load_image(os.path.join(self.directory, "missing.png"))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+
+import unittest
+import numpy as np
+from PIL import Image
+from ayab.image_transforms import transform, materialize_repeat, \
+  Cancellation, TransformCancelled
+
+
+class TestImageTransforms(unittest.TestCase):
+
+  def setUp(self):
+    pixels = np.random.RandomState(4).randint(0, 256, (6, 10, 4))
+    self.image = Image.fromarray(pixels.astype(np.uint8), 'RGBA')
+
+  def test_repeat(self):
+    image, repeat = transform("repeat", self.image, (1, 1), (2, 3))
+    assert repeat == (3, 2) and image.size == (10, 6)
+    image, repeat = transform("repeat", image, repeat, (1, 2))
+    assert repeat == (6, 2)
+
+  def test_rotate_repeats(self):
+    image, repeat = transform("rotate", self.image, (3, 2), (90.0,))
+    assert repeat == (2, 3) and image.size == (6, 10)
+    # other angles paste the repeats into the image first
+    image, repeat = transform("rotate", self.image, (3, 2), (180.0,))
+    assert repeat == (3, 2)
+    image, repeat = transform("rotate", self.image, (3, 2), (45.0,))
+    assert repeat == (1, 1)
+    assert image.size == materialize_repeat(self.image, (3, 2)) \
+      .rotate(45.0, expand=1).size
+
+  def test_materialize_repeat(self):
+    image = materialize_repeat(self.image, (3, 2))
+    pixels = np.asarray(image)
+    assert image.size == (30, 12)
+    assert (pixels == np.tile(np.asarray(self.image), (2, 3, 1))).all()
+
+  def test_invert(self):
+    image, repeat = transform("invert", self.image, (1, 1), ())
+    assert image.mode == "RGB"
+    assert (np.asarray(image) == 255 - np.asarray(self.image)[:, :, :3]).all()
+
+  def test_cancel(self):
+    cancellation = Cancellation()
+    cancellation.cancel()
+    with self.assertRaises(TransformCancelled):
+      transform("mirror", self.image, (1, 1), (), cancellation)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+
+import unittest
+from ayab import import_time
+
+# generous, an import past it has picked up a heavy dependency
+IMPORT_BUDGET = 0.5
+
+
+class TestImportTime(unittest.TestCase):
+
+  def test_core_without_gui(self):
+    for module in import_time.MODULES:
+      seconds, loaded = import_time.measure(module)
+      assert "PyQt5" not in loaded, module
+
+  def test_knitting_tools_load_fast(self):
+    for module in ("ayab.core.ayab_job", "ayab.core.ayab_session",
+                   "ayab.core.ayab_communication", "ayab.headless"):
+      seconds, loaded = import_time.measure(module)
+      assert loaded == [], (module, loaded)
+      assert seconds < IMPORT_BUDGET, (module, seconds)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from ayab.core.ayab_image import compileImage
+from ayab.core.ayab_planner import KnittingMode
+from ayab.core.ayab_job import KnitJob, JobFileError, \
+  encodeJob, readJob, writeJob
+from ayab.core.ayab_scheduler import LineScheduler
+
+
+class TestKnitJob(unittest.TestCase):
+
+  def setUp(self):
+    pixels = np.random.RandomState(5).randint(0, 256, (25, 40))
+    self.pil_image = Image.fromarray(pixels.astype(np.uint8), 'L')
+    self.options = {"num_colors": 3,
+                    "knitting_mode": KnittingMode.CLASSIC_RIBBER_1.value,
+                    "inf_repeat": 0, "start_needle": 70, "stop_needle": 129,
+                    "alignment": "center"}
+
+  def test_lines_match_image(self):
+    image = compileImage(self.pil_image, self.options)
+    image.setStartLine(2)
+    job = KnitJob(encodeJob(image))
+
+    colorRow, byteRow, imageRow = image.pattern()
+    assert job.numLines() == len(colorRow)
+    assert job.imgHeight() == 25 and job.startLine() == 2
+    assert job.knitStartNeedle() == 70 and job.knitStopNeedle() == 129
+    for lineNumber in range(job.numLines()):
+      color, payload, imgRow, flags = job.line(lineNumber)
+      assert color == colorRow[lineNumber] and imgRow == imageRow[lineNumber]
+      assert bytes(payload) == bytes(byteRow[lineNumber])
+      lastLine = lineNumber == job.numLines() - 1
+      assert flags == (lastLine | color << 3)
+
+    scheduler = LineScheduler(job)
+    assert scheduler.line(job.numLines() - 1)[3]
+
+  def test_inf_repeat_flags(self):
+    options = dict(self.options, inf_repeat=1)
+    job = KnitJob(encodeJob(compileImage(self.pil_image, options)))
+    assert job.infRepeat() == 1
+    for lineNumber in range(job.numLines()):
+      color, payload, imgRow, flags = job.line(lineNumber)
+      assert flags == color << 3
+
+  def test_corrupt_file(self):
+    data = bytearray(encodeJob(compileImage(self.pil_image, self.options)))
+    data[100] ^= 0x01
+    with self.assertRaises(JobFileError):
+      KnitJob(data)
+    with self.assertRaises(JobFileError):
+      KnitJob(data[:-1])
+    with self.assertRaises(JobFileError):
+      KnitJob(b"GIF89a" + bytes(100))
+
+  def test_read_without_pillow(self):
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, "pattern.ayabjob")
+      writeJob(path, compileImage(self.pil_image, self.options))
+      assert readJob(path).numColors() == 3
+
+      script = ("import sys\n"
+                "from ayab.core import ayab_job\n"
+                "job = ayab_job.readJob(sys.argv[1])\n"
+                "assert list(job.lines())\n"
+                "assert 'PIL' not in sys.modules\n"
+                "assert 'ayab.core.ayab_image' not in sys.modules\n")
+      subprocess.check_call([sys.executable, "-c", script, path],
+                            cwd=os.path.dirname(os.path.dirname(
+                              os.path.dirname(os.path.abspath(__file__)))))
+    finally:
+      shutil.rmtree(directory)
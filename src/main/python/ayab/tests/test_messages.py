@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import unittest
+from ayab.core.ayab_messages import MessageDecoder, CnfStart, CnfInfo, \
+  ReqLine, CnfTest, IndState
+
+
+class TestMessageDecoder(unittest.TestCase):
+
+  def setUp(self):
+    self.decoder = MessageDecoder()
+
+  def test_messages(self):
+    msg = self.decoder.decode(bytes([0xC1, 1]))
+    assert isinstance(msg, CnfStart) and msg.success == 1
+    msg = self.decoder.decode(bytes([0x82, 0xC0]))
+    assert isinstance(msg, ReqLine) and msg.lineNumber == 0xC0
+    msg = self.decoder.decode(bytes([0xC4, 0]))
+    assert isinstance(msg, CnfTest) and msg.success == 0
+    assert self.decoder.numUnknown() == 0
+
+  def test_cnf_info(self):
+    msg = self.decoder.decode(bytes([0xC3, 5, 0, 95]))
+    assert isinstance(msg, CnfInfo)
+    assert (msg.api, msg.firmwareMajor, msg.firmwareMinor) == (5, 0, 95)
+    # older firmware only sends its API version
+    msg = self.decoder.decode(bytes([0xC3, 4]))
+    assert (msg.api, msg.firmwareMajor) == (4, None)
+
+  def test_ind_state(self):
+    msg = self.decoder.decode(bytearray([0x84, 1, 0x01, 0x02, 0x03, 0x04,
+                                         2, 57]))
+    assert isinstance(msg, IndState)
+    assert (msg.ready, msg.hallLeft, msg.hallRight, msg.position) == \
+      (1, 0x0102, 0x0304, 57)
+    assert msg.carriageName() == "L Carriage"
+    msg = self.decoder.decode(bytes([0x84, 0, 0, 0, 0, 0, 9, 0]))
+    assert msg.carriageName() == ""
+    with self.assertRaises(AttributeError):
+      msg.unknown = 0
+
+  def test_unknown(self):
+    assert self.decoder.decode(bytes([0x99, 1])) is None
+    assert self.decoder.decode(b'') is None
+    # too short for its fields
+    assert self.decoder.decode(bytes([0x84, 1, 0])) is None
+    assert self.decoder.numUnknown() == 3
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+
+import unittest
+import numpy as np
+from PyQt5 import QtGui
+from ayab.pattern_view import qimageFromArray
+
+
+class TestQImageFromArray(unittest.TestCase):
+
+  def test_rgba_channels(self):
+    pixels = np.zeros((2, 3, 4), np.uint8)
+    pixels[1, 2] = (0x11, 0x22, 0x33, 0xff)
+    image = qimageFromArray(pixels, "RGBA")
+    assert image.format() == QtGui.QImage.Format_RGBA8888
+    assert image.pixel(2, 1) == 0xff112233
+
+  def test_rgb_odd_width(self):
+    pixels = np.zeros((3, 5, 3), np.uint8)
+    pixels[2, 4] = (0x11, 0x22, 0x33)
+    image = qimageFromArray(pixels, "RGB")
+    assert (image.width(), image.height()) == (5, 3)
+    assert image.pixel(4, 2) == 0xff112233
+
+  def test_grayscale(self):
+    pixels = np.full((4, 4), 0x80, np.uint8)
+    assert qimageFromArray(pixels, "L").pixel(3, 3) == 0xff808080
+
+  def test_palette(self):
+    pixels = np.array([[0, 1]], np.uint8)
+    image = qimageFromArray(pixels, "P", [0xff000000, 0xffff0000])
+    assert image.format() == QtGui.QImage.Format_Indexed8
+    assert image.pixel(1, 0) == 0xffff0000
+
+  def test_view_without_copy(self):
+    pixels = np.zeros((8, 8, 4), np.uint8)
+    image = qimageFromArray(pixels[2:5, 3:7], "RGBA")
+    assert (image.width(), image.height()) == (4, 3)
+    assert image.bytesPerLine() == 8 * 4
+    pixels[3, 4] = (1, 2, 3, 4)
+    assert image.pixel(1, 1) == 0x04010203
+
+  def test_strided_row(self):
+    pixels = np.zeros((8, 8, 4), np.uint8)
+    with self.assertRaises(ValueError):
+      qimageFromArray(pixels[:, ::2], "RGBA")
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import unittest
+from ayab.core.ayab_planner import KnittingMode, findPlan
+
+
+class TestPassPlans(unittest.TestCase):
+
+  def test_find_plan(self):
+    assert findPlan(KnittingMode.SINGLEBED, 2) is not None
+    assert findPlan(KnittingMode.SINGLEBED, 3) is None
+    assert findPlan(KnittingMode.CIRCULAR_RIBBER, 3) is None
+    assert findPlan(KnittingMode.CLASSIC_RIBBER_1, 2) is not \
+      findPlan(KnittingMode.CLASSIC_RIBBER_1, 3)
+
+  def test_classic_ribber_2_colors(self):
+    schedule = findPlan(KnittingMode.CLASSIC_RIBBER_1, 2).schedule(2, 3)
+    assert schedule.index.tolist() == [0, 1, 3, 2, 4, 5]
+    assert schedule.color.tolist() == [0, 1, 1, 0, 0, 1]
+    assert schedule.imgRow.tolist() == [0, 0, 1, 1, 2, 2]
+    assert schedule.masked.tolist() == [True, False, False, True, True, False]
+
+  def test_circular_ribber(self):
+    schedule = findPlan(KnittingMode.CIRCULAR_RIBBER, 2).schedule(2, 4)
+    assert schedule.index.tolist() == [0, 0, 1, 1, 2, 2, 3, 3]
+    # the last color, as sent before the planner
+    assert schedule.color.tolist() == [1] * 8
+    assert schedule.blank.tolist() == [False, True] * 4
+
+  def test_start_line(self):
+    schedule = findPlan(KnittingMode.SINGLEBED, 2).schedule(2, 3, startLine=2)
+    assert schedule.imgRow.tolist() == [2, 0, 1, 2, 0, 1]
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+
+import threading
+import time
+import unittest
+from ayab.core.ayab_progress import ProgressAggregator
+from ayab.core.ayab_session import KnitListener
+
+
+class RecordingListener(KnitListener):
+
+  def __init__(self, delay=0):
+    self.events = []
+    self.delay = delay
+    self.threads = set()
+
+  def __record(self, *event):
+    self.threads.add(threading.current_thread().name)
+    time.sleep(self.delay)
+    self.events.append(event)
+
+  def updateNotification(self, message=""):
+    self.__record("notification", message)
+
+  def updateColor(self, color):
+    self.__record("color", color)
+
+  def updateProgress(self, row, total=0, repeats=0):
+    self.__record("progress", row, total, repeats)
+
+  def playsound(self, event):
+    self.__record("sound", event)
+
+
+class TestProgressAggregator(unittest.TestCase):
+
+  def test_coalesce(self):
+    listener = RecordingListener()
+    aggregator = ProgressAggregator(listener, rate=10)
+    aggregator.start()
+    for row in range(1, 1001):
+      aggregator.updateColor("AB"[row % 2])
+      aggregator.updateProgress(row, 1000)
+      aggregator.playsound("nextline")
+    aggregator.stop()
+
+    progress = [e for e in listener.events if e[0] == "progress"]
+    assert 1 <= len(progress) <= 3
+    # the final state is always delivered
+    assert listener.events[-3:] == [("color", "A"), ("progress", 1000, 1000, 0),
+                                    ("sound", "nextline")]
+
+  def test_rate_limit(self):
+    listener = RecordingListener()
+    aggregator = ProgressAggregator(listener, rate=10)
+    aggregator.start()
+    start = time.time()
+    row = 0
+    # events spread over a second
+    while time.time() - start < 1.0:
+      row += 1
+      aggregator.updateProgress(row, 0)
+      time.sleep(0.001)
+    aggregator.stop()
+    progress = [e for e in listener.events if e[0] == "progress"]
+    assert row > 100
+    assert len(progress) <= 10 + 2
+    assert progress[-1] == ("progress", row, 0, 0)
+
+  def test_order(self):
+    listener = RecordingListener()
+    aggregator = ProgressAggregator(listener, rate=10)
+    aggregator.start()
+    aggregator.updateProgress(5, 10)
+    aggregator.updateNotification("finished")
+    aggregator.playsound("finished")
+    aggregator.stop()
+    assert listener.events == [("progress", 5, 10, 0),
+                               ("notification", "finished"),
+                               ("sound", "finished")]
+
+  def test_slow_listener(self):
+    listener = RecordingListener(delay=0.2)
+    aggregator = ProgressAggregator(listener, rate=60)
+    aggregator.start()
+    aggregator.updateProgress(1, 100)
+    time.sleep(0.05)
+    start = time.time()
+    for row in range(2, 101):
+      aggregator.updateProgress(row, 100)
+    # the session thread does not wait for the listener
+    assert time.time() - start < 0.1
+    aggregator.stop()
+    assert listener.events[-1] == ("progress", 100, 100, 0)
+    assert "ProgressAggregator" in listener.threads
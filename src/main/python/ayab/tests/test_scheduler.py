@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import time
+import unittest
+import numpy as np
+import sliplib
+from PIL import Image
+from ayab.core.ayab_image import ayabImage
+from ayab.core.ayab_planner import KnittingMode
+from ayab.core.ayab_scheduler import LineScheduler
+
+
+class TestLineScheduler(unittest.TestCase):
+
+  def setUp(self):
+    pixels = np.random.RandomState(7).randint(0, 256, (40, 30))
+    # some uniform rows give empty lines in ribber modes
+    pixels[10:20] = 255
+    self.pil_image = Image.fromarray(pixels.astype(np.uint8), 'L')
+
+  def image(self, knitting_mode, num_colors):
+    image = ayabImage(self.pil_image, {"num_colors": num_colors,
+                                       "knitting_mode": knitting_mode,
+                                       "inf_repeat": 0})
+    image.setKnitNeedles(0, 199)
+    return image
+
+  def assertLines(self, scheduler, pattern):
+    colorRow, byteRow, imageRow = pattern
+    for lineNumber in range(len(colorRow)):
+      color, bytes_, imgRow, lastLine = scheduler.line(lineNumber)
+      assert color == colorRow[lineNumber]
+      assert bytes(bytes_) == bytes(byteRow[lineNumber])
+      assert imgRow == imageRow[lineNumber]
+      assert lastLine == (lineNumber == len(colorRow) - 1)
+
+  def test_lines_match_pattern(self):
+    for knitting_mode, num_colors in [(KnittingMode.SINGLEBED, 2),
+                                      (KnittingMode.CLASSIC_RIBBER_1, 2),
+                                      (KnittingMode.CLASSIC_RIBBER_1, 4),
+                                      (KnittingMode.MIDDLECOLORSTWICE_RIBBER, 3),
+                                      (KnittingMode.HEARTOFPLUTO_RIBBER, 3)]:
+      image = self.image(knitting_mode.value, num_colors)
+      scheduler = LineScheduler(image, lookAhead=4)
+      self.assertLines(scheduler, image.pattern())
+      assert scheduler.line(scheduler.numLines()) is None
+
+  def test_inf_repeat(self):
+    image = self.image(KnittingMode.SINGLEBED.value, 2)
+    colorRow, byteRow, imageRow = image.pattern()
+    numLines = len(colorRow)
+    scheduler = LineScheduler(image, infRepeat=True, lookAhead=4)
+    for lineNumber in range(3 * numLines):
+      color, bytes_, imgRow, lastLine = scheduler.line(lineNumber)
+      assert imgRow == imageRow[lineNumber % numLines]
+      assert lastLine == (lineNumber % numLines == numLines - 1)
+
+  def test_frames(self):
+    image = self.image(KnittingMode.CLASSIC_RIBBER_1.value, 2)
+    colorRow, byteRow, imageRow = image.pattern()
+    numLines = len(colorRow)
+    for infRepeat in (False, True):
+      scheduler = LineScheduler(image, infRepeat=infRepeat, lookAhead=4)
+      for lineNumber in range(numLines):
+        frame = scheduler.frame(lineNumber)
+        lastLine = lineNumber == numLines - 1
+        assert frame.imgRow == imageRow[lineNumber]
+        assert frame.lastLine == lastLine
+        msg = sliplib.decode(bytes(frame.frame(lineNumber % 256)))
+        assert msg[2:-2] == bytes(byteRow[lineNumber])
+        assert msg[-2] == colorRow[lineNumber] << 3 \
+          | (lastLine and not infRepeat)
+
+  def test_request_earlier_line(self):
+    image = self.image(KnittingMode.CLASSIC_RIBBER_1.value, 2)
+    pattern = image.pattern()
+    scheduler = LineScheduler(image, lookAhead=2)
+    scheduler.line(50)
+    self.assertLines(scheduler, pattern)
+
+  def test_look_ahead(self):
+    image = self.image(KnittingMode.SINGLEBED.value, 2)
+    scheduler = LineScheduler(image, lookAhead=8)
+    scheduler.start()
+    try:
+      scheduler.line(0)
+      for i in range(100):
+        if scheduler.numLines() is not None or \
+            scheduler.numBuffered() > 8:
+          break
+        time.sleep(0.01)
+      assert scheduler.numBuffered() > 8
+      self.assertLines(scheduler, image.pattern())
+    finally:
+      scheduler.stop()
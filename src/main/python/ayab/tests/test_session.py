@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# This file is part of AYAB.
+#
+#    AYAB is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    AYAB is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with AYAB.  If not, see <http://www.gnu.org/licenses/>.
+#
+#    Copyright 2014 Sebastian Oliva, Christian Obersteiner, Andreas Müller, Christian Gerbrandt
+#    https://github.com/AllYarnsAreBeautiful/ayab-desktop
+
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+import numpy as np
+import sliplib
+from PIL import Image
+from ayab.headless import TerminalKnitListener
+from ayab.core.ayab_image import compileImage
+from ayab.core.ayab_job import KnitJob, encodeJob
+from ayab.core.ayab_communication import CommunicationException, checkCrc8
+from ayab.core.ayab_session import KnitSession, API_VERSION
+
+
+class FakeController(object):
+  """Answers like the controller does, requesting every line in turn."""
+
+  def __init__(self, api=API_VERSION):
+    self.__api = api
+    self.messages = []
+    self.lines = []
+    self.started = None
+
+  def receive(self, timeout=None):
+    if self.messages:
+      return self.messages.pop(0)
+    return None
+
+  def interrupt(self):
+    pass
+
+  def req_info(self):
+    # unknown messages are ignored
+    self.messages.append(bytes([0x99]))
+    self.messages.append(bytes([0xC3, self.__api, 0, 1]))
+    self.messages.append(bytes([0x84, 1, 0, 0, 0, 0, 1, 0]))
+
+  def req_start(self, startNeedle, stopNeedle, continuousReporting):
+    self.started = (startNeedle, stopNeedle)
+    self.messages.append(bytes([0xC1, 1]))
+    self.messages.append(bytes([0x82, 0]))
+
+  def cnf_line_frame(self, lineNumber, lineFrame):
+    msg = sliplib.decode(bytes(lineFrame.frame(lineNumber)))
+    assert msg[0] == 0x42 and msg[1] == lineNumber and checkCrc8(msg)
+    self.lines.append((lineNumber, msg[2:-2], msg[-2]))
+    self.messages.append(bytes([0x82, (lineNumber + 1) % 256]))
+
+
+class TestKnitSession(unittest.TestCase):
+
+  def setUp(self):
+    pixels = np.random.RandomState(2).randint(0, 256, (150, 30))
+    self.options = {"num_colors": 2, "knitting_mode": 1, "inf_repeat": 0,
+                    "start_needle": 80, "stop_needle": 119,
+                    "alignment": "center", "continuousReporting": False}
+    self.image = compileImage(Image.fromarray(pixels.astype(np.uint8), 'L'),
+                              self.options)
+
+  def test_knit(self):
+    controller = FakeController()
+    out = io.StringIO()
+    session = KnitSession(controller, self.image, self.options,
+                          TerminalKnitListener(out))
+    assert session.knit()
+
+    job = KnitJob(encodeJob(self.image))
+    assert controller.started == (80, 119)
+    assert len(controller.lines) == job.numLines() == 300
+    for lineNumber, (requested, payload, flags) in enumerate(controller.lines):
+      color, expected, imgRow, jobFlags = job.line(lineNumber)
+      assert requested == lineNumber % 256
+      assert payload == bytes(expected) and flags == jobFlags
+
+    report = out.getvalue().splitlines()
+    assert report[0] == "Connecting to machine..."
+    assert "row 1/150 color A" in report
+    assert report[-1].startswith("Image transmission finished.")
+
+  def test_wrong_api_version(self):
+    out = io.StringIO()
+    session = KnitSession(FakeController(api=4), self.image, self.options,
+                          TerminalKnitListener(out))
+    assert not session.knit()
+    assert "Wrong Arduino Firmware Version" in out.getvalue()
+
+  def test_cancel_wakes_session(self):
+
+    class SilentController(FakeController):
+      """Answers cnfStart, then waits for line requests that never come."""
+
+      def __init__(self):
+        super(SilentController, self).__init__()
+        self.__interrupted = threading.Event()
+
+      def receive(self, timeout=None):
+        if self.messages:
+          return self.messages.pop(0)
+        self.__interrupted.wait(timeout)
+        return None
+
+      def interrupt(self):
+        self.__interrupted.set()
+
+      def req_start(self, startNeedle, stopNeedle, continuousReporting):
+        self.messages.append(bytes([0xC1, 1]))
+
+    session = KnitSession(SilentController(), self.image, self.options)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(session.knit()))
+    thread.start()
+    time.sleep(0.1)
+    session.cancel()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert result == [False]
+
+  def test_lost_connection(self):
+
+    class ClosedController(FakeController):
+
+      def receive(self, timeout=None):
+        raise CommunicationException("serial port closed")
+
+    out = io.StringIO()
+    session = KnitSession(ClosedController(), self.image, self.options,
+                          TerminalKnitListener(out))
+    assert not session.knit()
+    assert "Lost the connection" in out.getvalue()
+
+  def test_headless_without_qt(self):
+    script = ("import sys\n"
+              "import ayab.headless\n"
+              "assert 'PyQt5' not in sys.modules\n"
+              "assert 'PIL' not in sys.modules\n")
+    subprocess.check_call([sys.executable, "-c", script],
+                          cwd=os.path.dirname(os.path.dirname(
+                            os.path.dirname(os.path.abspath(__file__)))))